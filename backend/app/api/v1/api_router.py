@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import tasks, analyze, logs, chat
+from app.api.v1.endpoints import tasks, analyze, logs, chat, webhooks
 
 api_router = APIRouter()
 
@@ -7,6 +7,7 @@ api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
 api_router.include_router(analyze.router, prefix="/analyze", tags=["analyze"])
 api_router.include_router(logs.router, prefix="/logs", tags=["logs"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
 
 @api_router.get("/health")
 async def health_check():
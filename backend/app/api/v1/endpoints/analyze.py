@@ -1,16 +1,17 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
-from app.services.repository import repo_service
-from app.services.analysis import analysis_engine
-from app.services.generator import file_generator
+from sse_starlette.sse import EventSourceResponse
+from typing import List, Optional
+from app.core.config import settings
+from app.background.tasks import submit_analysis
+from app.services.job_queue import job_queue, QueueFullError
+from app.services.request_coalescer import request_coalescer
 from loguru import logger
+import json
 import uuid
 
 from app.services.task_manager import task_manager
 
-from app.services.ai_service import ai_service
-
 router = APIRouter()
 
 class AnalyzeRequest(BaseModel):
@@ -18,64 +19,106 @@ class AnalyzeRequest(BaseModel):
     branch: str = "main"
     github_token: Optional[str] = None
 
-async def analyze_repo_task(task_id: str, repo_url: str, branch: str, github_token: Optional[str] = None):
+@router.post("/analyze")
+async def start_analysis(request: AnalyzeRequest):
+    try:
+        return await submit_analysis(request.repo_url, request.branch, request.github_token)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting analysis request for {request.repo_url}: {e}")
+        raise HTTPException(status_code=503, detail="Analysis pipeline is at capacity. Please retry later.", headers={"Retry-After": "30"})
+
+class BatchRepo(BaseModel):
+    repo_url: str
+    branch: str = "main"
+
+class BatchAnalyzeRequest(BaseModel):
+    repos: List[BatchRepo]
+    github_token: Optional[str] = None
+
+@router.post("/batch")
+async def start_batch_analysis(request: BatchAnalyzeRequest):
     """
-    Background task to clone, analyze, and generate files for a repo.
+    Queues many repositories as one batch job. The batch analyzes `BATCH_MAX_CONCURRENCY` of them
+    at a time and refines low-confidence findings several per AI request; `/batch/{batch_id}`
+    aggregates the progress of every member task.
     """
-    logger.info(f"Starting analysis task {task_id} for {repo_url}")
-    task_manager.update_task(task_id, "cloning")
-    
-    # 1. Clone
-    workspace = repo_service.clone_repository(repo_url, branch, token=github_token)
-    if not workspace:
-        logger.error(f"Task {task_id}: Cloning failed.")
-        task_manager.update_task(task_id, "failed", message="Cloning failed.")
-        return
-
-    # 2. Analyze
-    task_manager.update_task(task_id, "analyzing")
-    findings = analysis_engine.analyze_directory(workspace)
-    
-    # AI Refinement if confidence is low
-    if findings.get("confidence", 0) < 0.7:
-        logger.info(f"Task {task_id}: Low confidence ({findings.get('confidence')}). Requesting AI refinement...")
-        findings = await ai_service.refine_analysis(findings)
-    
-    # 3. Generate Deployment Files
-    task_manager.update_task(task_id, "generating")
-    file_generator.generate_deployment_files(workspace, findings)
-
-    # 4. Push changes if token provided
-    if github_token:
-        task_manager.update_task(task_id, "pushing")
-        logger.info(f"Task {task_id}: Attempting to push changes...")
-        repo_service.push_changes(workspace)
-
-    # 5. Cleanup
-    repo_service.cleanup_workspace(workspace)
-    
-    task_manager.update_task(task_id, "completed")
-    logger.info(f"Task {task_id}: Analysis and generation complete.")
+    if not request.repos:
+        raise HTTPException(status_code=400, detail="A batch needs at least one repository.")
+    if len(request.repos) > settings.BATCH_MAX_REPOS:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {settings.BATCH_MAX_REPOS} repositories.")
+
+    batch_id = str(uuid.uuid4())
+    # The same repository and branch listed twice is analyzed once
+    members = []
+    seen = set()
+    for repo in request.repos:
+        key = request_coalescer.make_key(repo.repo_url, repo.branch, request.github_token)
+        if key not in seen:
+            seen.add(key)
+            members.append({"task_id": str(uuid.uuid4()), "repo_url": repo.repo_url, "branch": repo.branch})
+    logger.info(f"Received batch analysis request for {len(members)} repositories. Assigned ID: {batch_id}")
+
+    await task_manager.create_batch(batch_id, members)
+    try:
+        position = await job_queue.enqueue(
+            "analyze_batch",
+            {"repos": members, "github_token": request.github_token},
+            job_id=batch_id,
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejecting batch analysis request: {e}")
+        for task_id in [batch_id] + [m["task_id"] for m in members]:
+            await task_manager.update_task(task_id, "failed", message="Analysis pipeline is at capacity.")
+        raise HTTPException(status_code=503, detail="Analysis pipeline is at capacity. Please retry later.", headers={"Retry-After": "30"})
 
-@router.post("/analyze")
-async def start_analysis(request: AnalyzeRequest, background_tasks: BackgroundTasks):
-    task_id = str(uuid.uuid4())
-    logger.info(f"Received analysis request for {request.repo_url}. Assigned ID: {task_id}")
-    
-    # Initialize task status
-    task_manager.update_task(task_id, "initialized")
-    
-    background_tasks.add_task(analyze_repo_task, task_id, request.repo_url, request.branch, request.github_token)
-    
     return {
         "status": "queued",
-        "task_id": task_id,
-        "message": f"Analysis for {request.repo_url} has been started in the background."
+        "batch_id": batch_id,
+        "total": len(members),
+        "duplicates": len(request.repos) - len(members),
+        "task_ids": [m["task_id"] for m in members],
+        "queue_position": position,
+        "message": f"Batch of {len(members)} repositories is queued at position {position}."
     }
 
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    batch = await task_manager.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    position = await job_queue.position(batch_id)
+    if position:
+        return {**batch, "queue_position": position}
+    return batch
+
 @router.get("/status/{task_id}")
 async def get_task_status(task_id: str):
-    status = task_manager.get_task(task_id)
+    status = await task_manager.get_task(task_id)
     if not status:
         raise HTTPException(status_code=404, detail="Task not found")
+    position = await job_queue.position(status.get("coalesced_with", task_id))
+    if position:
+        return {**status, "queue_position": position}
     return status
+
+@router.get("/events/{task_id}")
+async def stream_task_events(task_id: str, request: Request, last_event_id: Optional[int] = None):
+    """
+    SSE endpoint pushing a task's step transitions and progress deltas as they happen.
+    Events carry sequence numbers; reconnecting clients resume via the `Last-Event-ID` header.
+    """
+    if not await task_manager.get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+
+    async def event_generator():
+        async for seq, event, data in task_manager.subscribe(task_id, last_event_id or 0):
+            if event == "snapshot":
+                position = await job_queue.position(data.get("coalesced_with", task_id))
+                data = {**data, "queue_position": position} if position else data
+            yield {"id": str(seq), "event": event, "data": json.dumps(data, default=str)}
+
+    return EventSourceResponse(event_generator())
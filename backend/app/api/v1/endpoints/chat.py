@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
+import json
 from loguru import logger
 from app.services.ai_service import ai_service
 
@@ -20,3 +22,25 @@ async def chat_with_agent(request: ChatRequest):
     except Exception as e:
         logger.error(f"Chat endpoint failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to process chat message.")
+
+@router.post("/stream")
+async def stream_chat_with_agent(request: ChatRequest):
+    """
+    SSE endpoint forwarding the assistant's reply as it is generated.
+    Emits `token` events carrying `{"token": ...}` and a final `done` event.
+    """
+    logger.info(f"Received streaming chat message: {request.message[:50]}...")
+
+    async def token_generator():
+        async for chunk in ai_service.stream_chat(request.message):
+            yield {"event": "token", "data": json.dumps({"token": chunk})}
+        yield {"event": "done", "data": "{}"}
+
+    return EventSourceResponse(token_generator())
+
+@router.get("/stats")
+async def ai_stats():
+    """
+    AI provider configuration and response cache hit/miss metrics.
+    """
+    return ai_service.stats()
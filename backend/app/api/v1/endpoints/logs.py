@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from typing import Optional
+from loguru import logger
 from sse_starlette.sse import EventSourceResponse
 from app.services.log_streamer import log_streamer
 import asyncio
@@ -6,14 +8,26 @@ import asyncio
 router = APIRouter()
 
 @router.get("/stream")
-async def stream_logs():
+async def stream_logs(request: Request, level: Optional[str] = None, task_id: Optional[str] = None, replay: Optional[int] = None):
     """
     SSE endpoint to stream backend logs to the frontend.
+    Filters by minimum `level` and `task_id` server-side; new clients get the last `replay` lines first
+    and reconnecting clients resume after `Last-Event-ID`.
     """
+    if level:
+        try:
+            logger.level(level.upper())
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Unknown log level: {level}")
+
+    header = request.headers.get("last-event-id")
+    last_seq = int(header) if header and header.isdigit() else None
+
     async def log_generator():
-        async for log in log_streamer.subscribe():
+        async for seq, log in log_streamer.subscribe(replay=replay, level=level, task_id=task_id, last_seq=last_seq):
             # If the client disconnects, the subscribe generator will be closed
             yield {
+                "id": str(seq),
                 "data": log
             }
 
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, HTTPException, Request
+from loguru import logger
+import json
+
+from app.core.config import settings
+from app.background.tasks import submit_analysis
+from app.services.job_queue import QueueFullError, job_queue
+from app.services.request_coalescer import request_coalescer
+from app.services.webhooks import PushDebouncer, PushEvent, verify_signature, parse_push_event, is_relevant_push
+
+router = APIRouter()
+
+async def submit_push(push: PushEvent) -> bool:
+    """
+    Queues the analysis of a debounced push. Returns False, so the debouncer checks again later, while
+    the branch is still being analyzed (that run may predate the push) or the queue is full; no task is
+    created in either case.
+    """
+    token = settings.GITHUB_WEBHOOK_PUSH_TOKEN or None
+    leader_id = await request_coalescer.leader(request_coalescer.make_key(push.repo_url, push.branch, token))
+    if leader_id:
+        logger.info(f"Deferring webhook analysis of {push.repo_url}@{push.branch}: task {leader_id} is still running")
+        return False
+    if await job_queue.is_full():
+        logger.warning(f"Deferring webhook analysis of {push.repo_url}@{push.branch}: the job queue is full")
+        return False
+    try:
+        result = await submit_analysis(push.repo_url, push.branch, token)
+    except QueueFullError:
+        return False  # Filled up since the check
+    return result["status"] == "queued"
+
+push_debouncer = PushDebouncer(
+    submit_push,
+    delay=settings.WEBHOOK_DEBOUNCE_SECONDS,
+    max_delay=settings.WEBHOOK_DEBOUNCE_MAX_SECONDS,
+    max_retries=settings.WEBHOOK_MAX_RETRIES,
+)
+
+@router.post("/github", status_code=202)
+async def github_webhook(request: Request):
+    """
+    Receives GitHub webhook deliveries. Push events that touch files the analysis depends on are
+    debounced per branch and then analyzed; everything else is acknowledged and ignored.
+    """
+    if not settings.GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured.")
+    body = await request.body()
+    if not verify_signature(settings.GITHUB_WEBHOOK_SECRET, body, request.headers.get("x-hub-signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid signature.")
+
+    event = request.headers.get("x-github-event")
+    delivery = request.headers.get("x-github-delivery")
+    if event == "ping":
+        return {"status": "pong"}
+    if event != "push":
+        return {"status": "ignored", "reason": f"Unsupported event '{event}'."}
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Payload is not valid JSON.")
+    push = parse_push_event(payload)
+    if push is None:
+        return {"status": "ignored", "reason": "Not a branch update."}
+    if not is_relevant_push(push):
+        logger.info(f"Webhook {delivery}: push to {push.repo_url}@{push.branch} changes nothing the analysis uses")
+        return {"status": "ignored", "reason": "No relevant files changed."}
+
+    scheduled = push_debouncer.schedule(push)
+    logger.info(f"Webhook {delivery}: analysis of {push.repo_url}@{push.branch} scheduled in {scheduled['fires_in']}s")
+    return {"status": "scheduled", "repo_url": push.repo_url, "branch": push.branch, **scheduled}
@@ -0,0 +1,159 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from loguru import logger
+from app.core.config import settings
+from app.background import stages
+from app.services.pipeline_executor import pipeline_executor
+from app.services.findings_cache import findings_cache, analysis_baselines
+from app.services.analysis import analysis_engine
+from app.services.repository import repo_service
+from app.services.task_manager import task_manager, TERMINAL_STATUSES
+from app.services.ai_service import ai_service
+from app.services.refinement_batcher import refinement_batcher
+from app.services.request_coalescer import request_coalescer
+
+# Shared by every batch job of the process, so concurrent batches stay within BATCH_MAX_CONCURRENCY together
+batch_slots = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+async def analyze_repo_task(task_id: str, repo_url: str, branch: str, github_token: Optional[str] = None,
+                            batch_id: Optional[str] = None):
+    """
+    Background task to clone, analyze, and generate files for a repo.
+    Every log line it emits is tagged with the task id, so `/logs/stream?task_id=` can follow one task.
+    Members of a batch share their AI refinement requests with the rest of the batch.
+    """
+    with logger.contextualize(task_id=task_id):
+        await _run_analysis(task_id, repo_url, branch, github_token, batched=batch_id is not None)
+
+async def release_analysis(task_id: str, repo_url: str, branch: str, github_token: Optional[str] = None,
+                           batch_id: Optional[str] = None):
+    """
+    Called once an analysis has completed or finally failed, never before a retry.
+    Later identical requests then start a fresh run rather than attaching to a finished one.
+    """
+    await request_coalescer.release(request_coalescer.make_key(repo_url, branch, github_token), task_id)
+
+async def analyze_batch_task(batch_id: str, repos: List[Dict[str, Any]], github_token: Optional[str] = None):
+    """
+    Analyzes every repository of a batch; members of all batches share `BATCH_MAX_CONCURRENCY` slots.
+    Members finished by an earlier attempt of the batch job are skipped on retry.
+    The batch fails only when none of its members succeeded.
+    """
+    with logger.contextualize(task_id=batch_id):
+        logger.info(f"Starting batch {batch_id} of {len(repos)} repositories")
+        await task_manager.update_task(batch_id, "analyzing")
+
+        async def run(member: Dict[str, Any]):
+            async with batch_slots:
+                await _run_batch_member(batch_id, member, github_token)
+
+        await asyncio.gather(*(run(member) for member in repos))
+        batch = await task_manager.get_batch(batch_id)
+        counts = batch["counts"] if batch else {}
+        failed = counts.get("failed", 0) + counts.get("expired", 0)
+        if repos and failed == len(repos):
+            await task_manager.update_task(batch_id, "failed", message=f"All {failed} repositories failed.")
+            logger.error(f"Batch {batch_id} failed: no repository could be analyzed.")
+            return
+        await task_manager.update_task(batch_id, "completed")
+        logger.info(f"Batch {batch_id} complete ({failed} of {len(repos)} repositories failed).")
+
+async def _run_batch_member(batch_id: str, member: Dict[str, Any], github_token: Optional[str]):
+    task_id, repo_url, branch = member["task_id"], member["repo_url"], member["branch"]
+    task = await task_manager.get_task(task_id)
+    if task and task.get("status") in TERMINAL_STATUSES:
+        return
+
+    # Repositories already being analyzed elsewhere are followed, not cloned again
+    leader_id = await request_coalescer.claim(request_coalescer.make_key(repo_url, branch, github_token), task_id)
+    if leader_id and leader_id != task_id:
+        await task_manager.attach(task_id, leader_id)
+        return
+
+    try:
+        await analyze_repo_task(task_id, repo_url, branch, github_token, batch_id=batch_id)
+    except Exception as e:
+        # One repository must not take the rest of the batch down with it
+        logger.error(f"Task {task_id}: Batch member failed: {e}")
+        await task_manager.update_task(task_id, "failed", message=str(e))
+    # Members are not retried on their own, so either outcome is final
+    await release_analysis(task_id, repo_url, branch, github_token)
+
+async def _run_analysis(task_id: str, repo_url: str, branch: str, github_token: Optional[str] = None,
+                        batched: bool = False):
+    """
+    Blocking stages run on the pipeline executor so the event loop stays responsive.
+    Failures raise, leaving the caller to retry the task or mark it failed.
+    """
+    logger.info(f"Starting analysis task {task_id} for {repo_url}")
+
+    # 0. Check the findings cache against the remote head before paying for a clone
+    head_sha = await pipeline_executor.run_blocking(stages.resolve_head_stage, repo_url, branch, github_token)
+    cached = await findings_cache.get(repo_url, head_sha) if head_sha else None
+    if cached:
+        await task_manager.set_result(task_id, cached)
+        if not github_token:
+            # Without a push, generated files would be thrown away with the workspace
+            await task_manager.update_task(task_id, "completed")
+            logger.info(f"Task {task_id}: Served cached analysis for {head_sha[:7]}.")
+            return
+
+    await task_manager.update_task(task_id, "cloning")
+    
+    # 1. Clone
+    workspace = await pipeline_executor.run_blocking(stages.clone_stage, repo_url, branch, github_token)
+    if not workspace:
+        logger.error(f"Task {task_id}: Cloning failed.")
+        raise RuntimeError("Cloning failed.")
+
+    try:
+        # 2. Analyze (skipped when the cached findings still match the cloned commit)
+        workspace_sha = await pipeline_executor.run_blocking(stages.head_sha_stage, workspace)
+        if cached and workspace_sha == head_sha:
+            findings = cached
+        else:
+            await task_manager.update_task(task_id, "analyzing")
+            findings = None
+            # Patch the last analysis of this branch from the diff when there is one
+            baseline = analysis_baselines.take(repo_url, branch) if workspace_sha else None
+            if baseline:
+                previous_sha, previous = baseline
+                try:
+                    findings = await pipeline_executor.run_blocking(stages.incremental_analyze_stage, workspace, previous, previous_sha)
+                except Exception as e:
+                    # A broken baseline must not fail the task; the full analysis below replaces it
+                    logger.warning(f"Task {task_id}: Incremental analysis against {previous_sha[:7]} failed, running a full analysis: {e}")
+            if findings is None:
+                findings = await pipeline_executor.run_blocking(stages.analyze_stage, workspace)
+            
+            # AI Refinement if confidence is low
+            if findings.get("confidence", 0) < 0.7:
+                logger.info(f"Task {task_id}: Low confidence ({findings.get('confidence')}). Requesting AI refinement...")
+                refine = refinement_batcher.refine if batched else ai_service.refine_analysis
+                findings = await refine(findings)
+
+            if workspace_sha:
+                await findings_cache.set(repo_url, workspace_sha, findings)
+                analysis_baselines.put(repo_url, branch, workspace_sha, findings)
+            await task_manager.set_result(task_id, analysis_engine.summarize(findings))
+        
+        # 3. Generate Deployment Files and 4. Push them, if a token was provided.
+        # Generated files would otherwise be discarded with the workspace, so analysis-only runs never check out.
+        if github_token:
+            await task_manager.update_task(task_id, "generating")
+            await pipeline_executor.run_blocking(stages.checkout_stage, workspace, branch)
+            await pipeline_executor.run_blocking(stages.generate_stage, workspace, findings)
+
+            await task_manager.update_task(task_id, "pushing")
+            logger.info(f"Task {task_id}: Attempting to push changes...")
+            await pipeline_executor.run_blocking(stages.push_stage, workspace)
+    except Exception as e:
+        # The worker decides between a retry and a final failure
+        logger.error(f"Task {task_id}: Pipeline failed: {e}")
+        raise
+    finally:
+        # 5. Cleanup: only a rename here, the workspace reaper deletes it in the background
+        repo_service.cleanup_workspace(workspace)
+    
+    await task_manager.update_task(task_id, "completed")
+    logger.info(f"Task {task_id}: Analysis and generation complete.")
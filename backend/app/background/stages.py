@@ -0,0 +1,32 @@
+from typing import Any, Dict, Optional
+from app.services.repository import repo_service
+from app.services.analysis import analysis_engine
+from app.services.generator import file_generator
+
+# Blocking pipeline stages. They are module-level functions (not bound methods)
+# so the pipeline executor can ship them to a process pool as well as a thread pool.
+
+def resolve_head_stage(repo_url: str, branch: str, token: Optional[str] = None) -> Optional[str]:
+    return repo_service.resolve_head_sha(repo_url, branch, token=token)
+
+def head_sha_stage(workspace: str) -> Optional[str]:
+    return repo_service.get_head_sha(workspace)
+
+def clone_stage(repo_url: str, branch: str, token: Optional[str] = None) -> Optional[str]:
+    return repo_service.clone_repository(repo_url, branch, token=token)
+
+def analyze_stage(workspace: str) -> Dict[str, Any]:
+    # Read the committed tree from git objects; no working tree is needed for analysis
+    return analysis_engine.analyze_git_objects(workspace)
+
+def incremental_analyze_stage(workspace: str, previous: Dict[str, Any], previous_sha: str) -> Optional[Dict[str, Any]]:
+    return analysis_engine.analyze_git_diff(workspace, previous, previous_sha)
+
+def checkout_stage(workspace: str, branch: str):
+    repo_service.ensure_checkout(workspace, branch)
+
+def generate_stage(workspace: str, findings: Dict[str, Any]) -> bool:
+    return file_generator.generate_deployment_files(workspace, findings)
+
+def push_stage(workspace: str) -> bool:
+    return repo_service.push_changes(workspace)
@@ -1,5 +1,10 @@
+from typing import Any, Dict, Optional
 from loguru import logger
 import asyncio
+import uuid
+from app.services.job_queue import job_queue, QueueFullError
+from app.services.request_coalescer import request_coalescer
+from app.services.task_manager import task_manager
 
 async def dummy_background_task(task_name: str, duration: int = 5):
     """
@@ -8,3 +13,46 @@ async def dummy_background_task(task_name: str, duration: int = 5):
     logger.info(f"Starting background task: {task_name}")
     await asyncio.sleep(duration)
     logger.info(f"Completed background task: {task_name}")
+
+async def submit_analysis(repo_url: str, branch: str, github_token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Queues an analysis job for a repository, or attaches to an identical one already in flight.
+    Returns the response body for the caller; raises `QueueFullError` when the queue is at capacity.
+    """
+    task_id = str(uuid.uuid4())
+    logger.info(f"Received analysis request for {repo_url}. Assigned ID: {task_id}")
+
+    # Create the record before claiming: a leader without one looks finished to the next identical request.
+    # It also exists before a worker can pick the job up and start writing to it.
+    await task_manager.update_task(task_id, "queued")
+
+    # Identical requests already in flight share that job instead of cloning again
+    coalesce_key = request_coalescer.make_key(repo_url, branch, github_token)
+    leader_id = await request_coalescer.claim(coalesce_key, task_id)
+    if leader_id:
+        await task_manager.attach(task_id, leader_id)
+        return {
+            "status": "coalesced",
+            "task_id": task_id,
+            "coalesced_with": leader_id,
+            "queue_position": await job_queue.position(leader_id),
+            "message": f"An identical analysis of {repo_url} is already running; this task follows it."
+        }
+
+    try:
+        position = await job_queue.enqueue(
+            "analyze",
+            {"repo_url": repo_url, "branch": branch, "github_token": github_token},
+            job_id=task_id,
+        )
+    except QueueFullError:
+        await task_manager.update_task(task_id, "failed", message="Analysis pipeline is at capacity.")
+        await request_coalescer.release(coalesce_key, task_id)
+        raise
+
+    return {
+        "status": "queued",
+        "task_id": task_id,
+        "queue_position": position,
+        "message": f"Analysis for {repo_url} is queued at position {position}."
+    }
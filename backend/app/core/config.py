@@ -28,6 +28,79 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = ""
     OPENROUTER_API_KEY: str = ""
 
+    # Pipeline Executor
+    PIPELINE_EXECUTOR: str = "thread"  # "thread" or "process"
+    PIPELINE_MAX_WORKERS: int = 4  # Pool size for the blocking stages
+    PIPELINE_MAX_QUEUE: int = 32  # Waiting jobs beyond this are refused with 503
+
+    # Job Queue & Workers
+    JOB_QUEUE: str = "local"  # "local" (in-process) or "mongo" (shared by separate `python -m app.worker` processes)
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_SECONDS: int = 30
+    JOB_POLL_SECONDS: float = 1.0
+    WORKER_CONCURRENCY: int = 4  # Jobs run at once per worker
+    EMBEDDED_WORKER: bool = True  # Run a worker inside the API process; disable when running dedicated workers
+
+    # Repository Cloning
+    CLONE_STRATEGY: str = "auto"  # "auto", "full", "shallow", "blobless" or "sparse"
+    MIRROR_CACHE_ENABLED: bool = True
+    MIRROR_CACHE_DIR: str = "app/temp/mirrors"
+    MIRROR_CACHE_MAX_BYTES: int = 5 * 1024 ** 3
+    WORKSPACE_REAPER_WORKERS: int = 2  # Threads deleting discarded workspaces in the background
+    WORKSPACE_ORPHAN_SECONDS: int = 3600  # Workspaces left untouched this long are treated as orphans at startup
+
+    # Analysis
+    INDEX_MAX_DEPTH: int = 12
+    INDEX_MAX_FILES: int = 50000
+    SERVICE_ANALYSIS_WORKERS: int = 8
+    FINDINGS_CACHE_MAX_ENTRIES: int = 512
+    INCREMENTAL_ANALYSIS: bool = True  # Re-analyze new commits from a `git diff` against the last analyzed one
+    INCREMENTAL_MAX_BASELINES: int = 64  # Branches whose last findings (with file index) are kept in memory
+
+    # Task State
+    TASK_STORE: str = "memory"  # "memory" or "mongo"
+    TASK_TTL_SECONDS: int = 24 * 3600
+    TASK_MAX_ENTRIES: int = 10000  # In-memory store only
+    TASK_EVENTS_GRACE_SECONDS: int = 300  # How long a finished task's event log stays for resuming streams
+    TASK_EVENTS_POLL_SECONDS: float = 1.0  # Store polling interval for tasks running in another process
+
+    # AI Providers
+    OPENROUTER_TIMEOUT_SECONDS: float = 30.0
+    GEMINI_TIMEOUT_SECONDS: float = 30.0
+    AI_HEDGE_DELAY_SECONDS: Optional[float] = None  # Start the next provider if the current one hasn't answered by then
+    AI_STREAM_CHUNK_TIMEOUT_SECONDS: float = 15.0  # A chat stream silent this long after its first chunk is cut off
+    AI_PROMPT_TOKEN_BUDGET: int = 1500  # Approximate size of the repository context sent for refinement
+    AI_FAKE_PROVIDER: bool = False  # Offline, deterministic provider for development and tests
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 1024
+    AI_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    AI_BREAKER_WINDOW: int = 20  # Recent calls per provider considered by its circuit breaker
+    AI_BREAKER_MIN_CALLS: int = 5
+    AI_BREAKER_FAILURE_RATE: float = 0.5
+    AI_BREAKER_SLOW_CALL_SECONDS: float = 15.0
+    AI_BREAKER_SLOW_CALL_RATE: float = 0.8
+    AI_BREAKER_OPEN_SECONDS: float = 60.0
+
+    # Batch Analysis
+    BATCH_MAX_REPOS: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8  # Repositories of one batch analyzed at once
+    BATCH_REFINE_MAX_REPOS: int = 8  # Low-confidence repositories refined per AI request
+    BATCH_REFINE_WINDOW_SECONDS: float = 2.0  # How long a refinement waits for others to share its request
+
+    # GitHub Webhooks
+    GITHUB_WEBHOOK_SECRET: str = ""  # Required; deliveries are refused until it is set
+    GITHUB_WEBHOOK_PUSH_TOKEN: str = ""  # Token for pushing regenerated files; analysis only when empty
+    WEBHOOK_DEBOUNCE_SECONDS: float = 10.0  # Quiet period after a push before the branch is analyzed
+    WEBHOOK_DEBOUNCE_MAX_SECONDS: float = 60.0  # A branch receiving a steady stream of pushes still runs by then
+    WEBHOOK_MAX_RETRIES: int = 5  # Re-checks, with doubling delays, of a push whose branch is busy or whose queue is full
+
+    # Log Streaming
+    LOG_BUFFER_SIZE: int = 2000  # Lines kept in the shared ring buffer
+    LOG_REPLAY_LINES: int = 100  # Lines replayed to a new subscriber by default
+    LOG_IDLE_REPLAY_LEVEL: str = "INFO"  # With no subscribers, only lines at this level or above are kept for replay
+    LOG_DROP_POLICY: str = "drop_oldest"  # "drop_oldest" (skip ahead with a marker) or "disconnect"
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
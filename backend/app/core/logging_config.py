@@ -28,11 +28,9 @@ def setup_logging():
     from app.services.log_streamer import log_streamer
     
     def log_streamer_sink(message):
+        # Runs on whichever thread logged; only stores the raw fields, formatting happens on delivery
         record = message.record
-        time_str = record["time"].strftime("%H:%M:%S")
-        level_str = record["level"].name
-        msg_str = record["message"]
-        log_streamer.push_log(f"{time_str} | {level_str} | {msg_str}")
+        log_streamer.push_log(record["time"], record["level"].no, record["level"].name, record["message"], record["extra"].get("task_id"))
 
     logger.configure(
         handlers=[
@@ -42,7 +40,8 @@ def setup_logging():
             },
             {
                 "sink": log_streamer_sink,
-                "format": "{time:HH:mm:ss} | {level} | {message}",
+                "format": "{message}",
+                "filter": lambda record: log_streamer.wants_record(record["level"].no),
             }
         ]
     )
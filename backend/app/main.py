@@ -1,21 +1,46 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.logging_config import setup_logging
 from app.db.mongodb import db
+from app.services.pipeline_executor import pipeline_executor
+from app.services.workspace_reaper import workspace_reaper
+from app.services.log_streamer import log_streamer
+from app.services.task_manager import task_manager
+from app.services.job_queue import job_queue
+from app.services.request_coalescer import request_coalescer
+from app.worker import Worker
 from app.api.v1.api_router import api_router
+from app.api.v1.endpoints.webhooks import push_debouncer
 
 # Initialize logging
 logger = setup_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Connect to MongoDB
+    # Startup: Connect to MongoDB and let log sinks on other threads reach the SSE subscribers
+    log_streamer.bind_loop(asyncio.get_running_loop())
     await db.connect_to_mongo()
+    await task_manager.store.setup()
+    await job_queue.setup()
+    # Workspaces and mirrors left behind by crashed tasks or an earlier process
+    workspace_reaper.sweep(settings.WORKSPACE_ORPHAN_SECONDS)
+    workspace_reaper.sweep_trash(settings.MIRROR_CACHE_DIR)
+    await request_coalescer.setup()
+    worker = None
+    if settings.EMBEDDED_WORKER:
+        worker = Worker(job_queue, settings.WORKER_CONCURRENCY)
+        worker.start()
     logger.info("Application startup complete.")
     yield
-    # Shutdown: Close MongoDB connection
+    # Shutdown: Submit debounced pushes, stop pipeline workers and close MongoDB connection
+    await push_debouncer.flush()
+    if worker:
+        await worker.stop()
+    pipeline_executor.shutdown()
+    workspace_reaper.shutdown()
     await db.close_mongo_connection()
     logger.info("Application shutdown complete.")
 
@@ -0,0 +1,107 @@
+import datetime
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from app.core.config import settings
+from app.db.mongodb import db
+
+
+class AIResponseCache:
+    """
+    Two-tier cache of provider responses keyed by a normalized hash of (kind, provider, model, prompt).
+    The in-memory LRU is checked first, then the MongoDB collection (with a TTL index) when a database
+    is connected. Hit and miss counts are kept per tier for `stats()`.
+    """
+
+    collection_name = "ai_response_cache"
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 7 * 86400, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires at, response)
+        self.metrics = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0}
+        self._index_ready = False
+
+    @staticmethod
+    def make_key(kind: str, provider: str, model: str, prompt: str) -> str:
+        # Whitespace and indentation differences don't change what the model is asked
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{kind}|{provider}|{model}|{normalized}".encode()).hexdigest()
+
+    def _remember(self, key: str, response: Any, expires_at: float):
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def _collection(self):
+        collection = db.db[self.collection_name]
+        if not self._index_ready:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        return collection
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._memory.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return entry[1]
+            del self._memory[key]
+
+        if db.db is not None:
+            try:
+                doc = await (await self._collection()).find_one({"_id": key})
+                if doc:
+                    expires_at = doc["expires_at"].replace(tzinfo=datetime.timezone.utc).timestamp()
+                    self._remember(key, doc["response"], expires_at)
+                    self.metrics["mongo_hits"] += 1
+                    return doc["response"]
+            except Exception as e:
+                logger.warning(f"AI response cache lookup failed: {e}")
+        self.metrics["misses"] += 1
+        return None
+
+    async def set(self, key: str, response: Any):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, response, expires_at)
+        self.metrics["stores"] += 1
+
+        if db.db is not None:
+            try:
+                await (await self._collection()).replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "response": response,
+                        "expires_at": datetime.datetime.fromtimestamp(expires_at, datetime.timezone.utc),
+                    },
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to persist AI response cache entry: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.metrics["memory_hits"] + self.metrics["mongo_hits"]
+        lookups = hits + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "enabled": self.enabled,
+        }
+
+
+ai_cache = AIResponseCache(
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+    enabled=settings.AI_CACHE_ENABLED,
+)
@@ -1,29 +1,52 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
+from app.services.prompt_context import prompt_context_builder
 
 class AIProvider(ABC):
+    # Seconds AIService waits for one call before giving up on this provider
+    timeout: float = 30.0
+    # Model identifier, part of the response cache key
+    model_name: str = ""
+
+    @property
+    def name(self) -> str:
+        return self.__class__.__name__
+
     @abstractmethod
     async def refine_analysis(self, findings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Refines the analysis using the specific AI provider."""
         pass
 
+    async def refine_batch(self, batch: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """
+        Refines several analyses, returning one result (or None) per entry in order.
+        Providers that can answer `_get_batch_prompt` in a single request override this.
+        """
+        results = [await self.refine_analysis(findings) for findings in batch]
+        return results if any(results) else None
+
     @abstractmethod
     async def chat(self, message: str) -> Optional[str]:
         """Generates a conversational response based on the user's message."""
         pass
 
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        """
+        Yields the response to `message` in chunks as the provider produces them.
+        Providers without a streaming API fall back to a single chunk.
+        """
+        response = await self.chat(message)
+        if response:
+            yield response
+
     def _get_prompt(self, findings: Dict[str, Any]) -> str:
-        file_list = findings.get("file_index", {}).get("all_files", [])[:100]
+        # Ranked, budgeted and deterministic, so the same layout yields the same prompt (and cache key)
+        context = prompt_context_builder.build(findings)
         return f"""
-        Analyze the following project file structure and suggest the main programming language, 
+        Analyze the following project structure and suggest the main programming language, 
         framework, and the best entry point for a Docker container.
         
-        Files:
-        {", ".join(file_list)}
-        
-        Current Findings:
-        Language: {findings.get('language')}
-        Framework: {findings.get('framework')}
+{context}
         
         Respond ONLY in JSON format like:
         {{
@@ -34,6 +57,31 @@ class AIProvider(ABC):
         }}
         """
 
+    def _get_batch_prompt(self, batch: List[Dict[str, Any]]) -> str:
+        # Each project gets an equal share of the budget, with a floor so small contexts stay useful
+        share = max(prompt_context_builder.token_budget // len(batch), 250)
+        projects = "\n\n".join(
+            f"### Project {i}\n{prompt_context_builder.build(findings, token_budget=share)}"
+            for i, findings in enumerate(batch, start=1)
+        )
+        return f"""
+        Analyze each of the following {len(batch)} independent projects and suggest its main programming
+        language, framework, and the best entry point for a Docker container.
+        
+{projects}
+        
+        Respond ONLY in JSON format, with one entry per project number, like:
+        {{
+            "1": {{"language": "...", "framework": "...", "entry_point": "...", "confidence": 0.9}},
+            "2": {{"language": "...", "framework": "...", "entry_point": "...", "confidence": 0.9}}
+        }}
+        """
+
+    def _parse_batch(self, text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+        data = self._parse_json(text)
+        results = [data.get(str(i)) for i in range(1, count + 1)]
+        return [r if isinstance(r, dict) else None for r in results]
+
     def _parse_json(self, text: str) -> Dict[str, Any]:
         import json
         text = text.strip()
@@ -0,0 +1,52 @@
+import asyncio
+from loguru import logger
+from .base import AIProvider
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+class FakeProvider(AIProvider):
+    """
+    Deterministic, offline provider for development and tests. It confirms the static findings
+    with a fixed confidence and echoes chat messages, after an optional simulated latency.
+    """
+
+    def __init__(self, latency: float = 0.0, timeout: float = 30.0):
+        self.latency = latency
+        self.timeout = timeout
+        self.model_name = "fake"
+        self.calls = 0
+        logger.info("FakeProvider initialized.")
+
+    async def refine_analysis(self, findings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {
+            "language": findings.get("language", "Unknown"),
+            "framework": findings.get("framework", "Unknown"),
+            "entry_point": findings.get("entry_point"),
+            "confidence": 0.75,
+        }
+
+    async def refine_batch(self, batch: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        # One simulated round-trip for the whole batch, like a real provider
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [
+            {
+                "language": findings.get("language", "Unknown"),
+                "framework": findings.get("framework", "Unknown"),
+                "entry_point": findings.get("entry_point"),
+                "confidence": 0.75,
+            }
+            for findings in batch
+        ]
+
+    async def chat(self, message: str) -> Optional[str]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"(offline assistant) You asked: {message.strip()}"
+
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        self.calls += 1
+        for i, word in enumerate(f"(offline assistant) You asked: {message.strip()}".split(" ")):
+            await asyncio.sleep(self.latency)
+            yield f" {word}" if i else word
@@ -1,14 +1,16 @@
 import google.generativeai as genai
 from loguru import logger
 from .base import AIProvider
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 
 class GeminiProvider(AIProvider):
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = 30.0):
         self.api_key = api_key
+        self.timeout = timeout
+        self.model_name = "gemini-2.0-flash"
         try:
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
+            self.model = genai.GenerativeModel(self.model_name)
             logger.info("GeminiProvider initialized.")
         except Exception as e:
             logger.error(f"Failed to initialize GeminiProvider: {e}")
@@ -20,20 +22,47 @@ class GeminiProvider(AIProvider):
         
         try:
             prompt = self._get_prompt(findings)
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             return self._parse_json(response.text)
         except Exception as e:
             logger.error(f"Gemini refinement failed: {e}")
             return None
 
+    async def refine_batch(self, batch: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        if not self.model:
+            return None
+
+        try:
+            response = await self.model.generate_content_async(self._get_batch_prompt(batch))
+            return self._parse_batch(response.text, len(batch))
+        except Exception as e:
+            logger.error(f"Gemini batch refinement failed: {e}")
+            return None
+
     async def chat(self, message: str) -> Optional[str]:
         if not self.model:
             return None
 
         try:
-            prompt = f"You are a helpful AI Deployment Assistant. Answer the following user query directly and concisely.\n\nUser: {message}\nAssistant:"
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(self._chat_prompt(message))
             return response.text
         except Exception as e:
             logger.error(f"Gemini chat failed: {e}")
             return None
+
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        if not self.model:
+            return
+
+        response = await self.model.generate_content_async(self._chat_prompt(message), stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. a safety stop) carry nothing to forward
+                continue
+            if text:
+                yield text
+
+    def _chat_prompt(self, message: str) -> str:
+        return f"You are a helpful AI Deployment Assistant. Answer the following user query directly and concisely.\n\nUser: {message}\nAssistant:"
@@ -1,18 +1,19 @@
 from openai import AsyncOpenAI
 from loguru import logger
 from .base import AIProvider
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 
 class OpenRouterProvider(AIProvider):
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = 30.0):
         self.api_key = api_key
+        self.timeout = timeout
         try:
             self.client = AsyncOpenAI(
                 base_url="https://openrouter.ai/api/v1",
                 api_key=self.api_key,
             )
             # Default to a versatile model
-            self.model = "google/gemini-2.0-flash-001" 
+            self.model = self.model_name = "google/gemini-2.0-flash-001" 
             logger.info("OpenRouterProvider initialized.")
         except Exception as e:
             logger.error(f"Failed to initialize OpenRouterProvider: {e}")
@@ -40,7 +41,7 @@ class OpenRouterProvider(AIProvider):
             logger.error(f"OpenRouter refinement failed: {e}")
             return None
 
-    async def chat(self, message: str) -> Optional[str]:
+    async def refine_batch(self, batch: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
         if not self.client:
             return None
 
@@ -48,15 +49,58 @@ class OpenRouterProvider(AIProvider):
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a helpful AI Deployment Assistant. Answer user queries about web deployment, code analysis, and DevOps correctly and concisely."},
-                    {"role": "user", "content": message}
+                    {"role": "user", "content": self._get_batch_prompt(batch)}
                 ],
                 extra_headers={
                     "HTTP-Referer": "https://github.com/Akshayikify/Auto_Deployment_tool",
                     "X-Title": "Auto Deploy AI",
                 }
             )
+            return self._parse_batch(response.choices[0].message.content, len(batch))
+        except Exception as e:
+            logger.error(f"OpenRouter batch refinement failed: {e}")
+            return None
+
+    def _chat_messages(self, message: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": "You are a helpful AI Deployment Assistant. Answer user queries about web deployment, code analysis, and DevOps correctly and concisely."},
+            {"role": "user", "content": message}
+        ]
+
+    async def chat(self, message: str) -> Optional[str]:
+        if not self.client:
+            return None
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._chat_messages(message),
+                extra_headers={
+                    "HTTP-Referer": "https://github.com/Akshayikify/Auto_Deployment_tool",
+                    "X-Title": "Auto Deploy AI",
+                }
+            )
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"OpenRouter chat failed: {e}")
             return None
+
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        if not self.client:
+            return
+
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._chat_messages(message),
+            stream=True,
+            extra_headers={
+                "HTTP-Referer": "https://github.com/Akshayikify/Auto_Deployment_tool",
+                "X-Title": "Auto Deploy AI",
+            }
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
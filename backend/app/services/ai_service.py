@@ -1,25 +1,141 @@
-from typing import Dict, Any, List, Optional
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
 from loguru import logger
 from app.core.config import settings
 from .ai_providers.gemini_provider import GeminiProvider
 from .ai_providers.openrouter_provider import OpenRouterProvider
+from .ai_providers.fake_provider import FakeProvider
 from .ai_providers.base import AIProvider
+from .ai_cache import ai_cache
+from .circuit_breaker import CircuitBreaker
+
+T = TypeVar("T")
 
 class AIService:
     def __init__(self):
         self.providers: List[AIProvider] = []
+        self.hedge_delay = settings.AI_HEDGE_DELAY_SECONDS
+        self.stream_chunk_timeout = settings.AI_STREAM_CHUNK_TIMEOUT_SECONDS
         
         # Initialize providers based on available keys
         # We prioritize OpenRouter if provided, as it's often more flexible
         if settings.OPENROUTER_API_KEY:
-            self.providers.append(OpenRouterProvider(settings.OPENROUTER_API_KEY))
+            self.providers.append(OpenRouterProvider(settings.OPENROUTER_API_KEY, timeout=settings.OPENROUTER_TIMEOUT_SECONDS))
         
         if settings.GOOGLE_API_KEY:
-            self.providers.append(GeminiProvider(settings.GOOGLE_API_KEY))
+            self.providers.append(GeminiProvider(settings.GOOGLE_API_KEY, timeout=settings.GEMINI_TIMEOUT_SECONDS))
+
+        if settings.AI_FAKE_PROVIDER:
+            self.providers.append(FakeProvider())
 
         if not self.providers:
             logger.warning("No AI providers configured. Refinement will be disabled.")
 
+        self.breakers: Dict[str, CircuitBreaker] = {
+            provider.name: CircuitBreaker(
+                provider.name,
+                window=settings.AI_BREAKER_WINDOW,
+                min_calls=settings.AI_BREAKER_MIN_CALLS,
+                failure_rate=settings.AI_BREAKER_FAILURE_RATE,
+                slow_call_seconds=settings.AI_BREAKER_SLOW_CALL_SECONDS,
+                slow_call_rate=settings.AI_BREAKER_SLOW_CALL_RATE,
+                open_seconds=settings.AI_BREAKER_OPEN_SECONDS,
+            )
+            for provider in self.providers
+        }
+
+    def _breaker(self, provider: AIProvider) -> CircuitBreaker:
+        if provider.name not in self.breakers:
+            self.breakers[provider.name] = CircuitBreaker(provider.name)
+        return self.breakers[provider.name]
+
+    def ordered_providers(self) -> List[AIProvider]:
+        """
+        Providers by expected cost (median latency over success rate), healthiest first.
+        Ties, including providers without enough history, keep the configured order.
+        """
+        return sorted(self.providers, key=lambda p: self._breaker(p).expected_cost())
+
+    @staticmethod
+    def _is_useful(result: Any) -> bool:
+        # A batch answer where every entry failed is a failure, not a result to cache
+        if isinstance(result, list):
+            return any(result)
+        return bool(result)
+
+    async def _call(self, provider: AIProvider, call: Callable[[AIProvider], Awaitable[Optional[T]]], label: str,
+                    prompt: Callable[[AIProvider], str]) -> Optional[T]:
+        """
+        Answers from the response cache when possible, otherwise runs one provider call under the
+        provider's timeout and caches a useful result. Failures are logged and reported as None.
+        """
+        key = ai_cache.make_key(label, provider.name, provider.model_name, prompt(provider))
+        cached = await ai_cache.get(key)
+        if cached is not None and self._is_useful(cached):
+            logger.info(f"AI response cache hit for {label} ({provider.name})")
+            return cached
+        breaker = self._breaker(provider)
+        if not breaker.allow():
+            logger.info(f"Skipping {provider.name} for {label}: circuit {breaker.state}")
+            return None
+
+        start = time.monotonic()
+        result = None
+        try:
+            result = await asyncio.wait_for(call(provider), provider.timeout)
+            if self._is_useful(result):
+                await ai_cache.set(key, result)
+        except asyncio.CancelledError:
+            # Lost a hedge race: says nothing about the provider's health
+            breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Provider {provider.name} timed out after {provider.timeout}s during {label}")
+        except Exception as e:
+            logger.error(f"Provider {provider.name} failed during {label}: {e}")
+        breaker.record(self._is_useful(result), time.monotonic() - start)
+        return result
+
+    async def _first_success(self, call: Callable[[AIProvider], Awaitable[Optional[T]]], label: str,
+                             prompt: Callable[[AIProvider], str]) -> Tuple[Optional[AIProvider], Optional[T]]:
+        """
+        Tries providers in order until one returns a result. A failed or timed-out provider hands over
+        to the next one. In hedged mode (`AI_HEDGE_DELAY_SECONDS`) the next provider is also started when
+        the current one is still silent after the delay; the first result wins and the others are cancelled.
+        """
+        remaining = iter(self.ordered_providers())
+        pending: Dict[asyncio.Task, AIProvider] = {}
+
+        def launch() -> bool:
+            provider = next(remaining, None)
+            if provider is None:
+                return False
+            if pending:
+                logger.info(f"Hedging {label} with {provider.name}...")
+            pending[asyncio.create_task(self._call(provider, call, label, prompt))] = provider
+            return True
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Hedge delay elapsed; keep waiting on what's running if there is nobody left to start
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    result = task.result()
+                    if self._is_useful(result):
+                        return provider, result
+                if not pending:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        return None, None
+
     async def refine_analysis(self, findings: Dict[str, Any]) -> Dict[str, Any]:
         """
         Orchestrates refinement across available AI providers with a fallback mechanism.
@@ -27,25 +143,49 @@ class AIService:
         if not self.providers:
             return findings
 
-        for provider in self.providers:
-            try:
-                logger.info(f"Attempting AI refinement with {provider.__class__.__name__}...")
-                ai_data = await provider.refine_analysis(findings)
-                
-                if ai_data:
-                    logger.info(f"Refinement successful using {provider.__class__.__name__}")
-                    findings.update(ai_data)
-                    findings["ai_refined"] = True
-                    findings["ai_provider"] = provider.__class__.__name__
-                    return findings
-                
-            except Exception as e:
-                logger.error(f"Provider {provider.__class__.__name__} failed: {e}")
-                continue
+        logger.info(f"Attempting AI refinement with {', '.join(p.name for p in self.providers)}...")
+        provider, ai_data = await self._first_success(
+            lambda p: p.refine_analysis(findings), "refinement", lambda p: p._get_prompt(findings)
+        )
+        if ai_data:
+            logger.info(f"Refinement successful using {provider.name}")
+            return self._apply(findings, provider, ai_data)
 
         logger.warning("All AI providers failed to refine analysis.")
         return findings
 
+    async def refine_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Refines several analyses with a single provider request. Entries the answer leaves out
+        (or a batch nobody could answer) fall back to one `refine_analysis` each.
+        """
+        if not self.providers:
+            return batch
+
+        logger.info(f"Attempting batched AI refinement of {len(batch)} analyses...")
+        provider, results = await self._first_success(
+            lambda p: p.refine_batch(batch), "batch_refinement", lambda p: p._get_batch_prompt(batch)
+        )
+        results = results or [None] * len(batch)
+        missing = []
+        for findings, ai_data in zip(batch, results):
+            if ai_data:
+                self._apply(findings, provider, ai_data)
+            else:
+                missing.append(findings)
+        if provider:
+            logger.info(f"Batched refinement using {provider.name} answered {len(batch) - len(missing)} of {len(batch)}")
+        if missing:
+            await asyncio.gather(*(self.refine_analysis(findings) for findings in missing))
+        return batch
+
+    @staticmethod
+    def _apply(findings: Dict[str, Any], provider: AIProvider, ai_data: Dict[str, Any]) -> Dict[str, Any]:
+        findings.update(ai_data)
+        findings["ai_refined"] = True
+        findings["ai_provider"] = provider.name
+        return findings
+
     async def chat_with_agent(self, message: str) -> str:
         """
         Orchestrates generic chat queries across available providers.
@@ -53,15 +193,79 @@ class AIService:
         if not self.providers:
             return "I'm currently running in offline mode without an API key, so I can only perform basic static analysis and generic replies."
 
-        for provider in self.providers:
-            try:
-                response = await provider.chat(message)
-                if response:
-                    return response
-            except Exception as e:
-                logger.error(f"Provider {provider.__class__.__name__} failed during chat: {e}")
-                continue
+        _, response = await self._first_success(lambda p: p.chat(message), "chat", lambda p: message)
+        if response:
+            return response
                 
         return "I'm sorry, I'm having trouble connecting to my AI backend right now. Please try again later."
 
+    async def stream_chat(self, message: str) -> AsyncIterator[str]:
+        """
+        Streams a chat response chunk by chunk from the first healthy provider. A provider that fails or
+        times out before its first chunk hands over to the next; once chunks have been sent the stream
+        stays with that provider, and ends with a note if it stalls for `stream_chunk_timeout` between chunks.
+        Complete responses are cached like `chat_with_agent` results.
+        """
+        if not self.providers:
+            yield "I'm currently running in offline mode without an API key, so I can only perform basic static analysis and generic replies."
+            return
+
+        for provider in self.ordered_providers():
+            key = ai_cache.make_key("chat", provider.name, provider.model_name, message)
+            cached = await ai_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+            breaker = self._breaker(provider)
+            if not breaker.allow():
+                continue
+            start = time.monotonic()
+            chunks: List[str] = []
+            stream = provider.stream_chat(message).__aiter__()
+            try:
+                try:
+                    # Time to first token is bounded by the provider timeout
+                    first = await asyncio.wait_for(stream.__anext__(), provider.timeout)
+                except StopAsyncIteration:
+                    breaker.record(False, time.monotonic() - start)
+                    continue
+                breaker.record(True, time.monotonic() - start)
+                chunks.append(first)
+                yield first
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), self.stream_chunk_timeout)
+                    except StopAsyncIteration:
+                        break
+                    chunks.append(chunk)
+                    yield chunk
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                if not chunks:
+                    breaker.record(False, time.monotonic() - start)
+                    logger.error(f"Provider {provider.name} failed to start streaming chat: {e!r}")
+                    continue
+                logger.error(f"Provider {provider.name} failed mid-stream: {e!r}")
+                yield "\n\n[The response was interrupted. Please try again.]"
+                return
+            finally:
+                await stream.aclose()
+            await ai_cache.set(key, "".join(chunks))
+            return
+
+        yield "I'm sorry, I'm having trouble connecting to my AI backend right now. Please try again later."
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": [
+                {"name": p.name, "model": p.model_name, "timeout": p.timeout, "breaker": self._breaker(p).stats()}
+                for p in self.ordered_providers()
+            ],
+            "hedge_delay": self.hedge_delay,
+            "cache": ai_cache.stats(),
+        }
+
 ai_service = AIService()
@@ -1,40 +1,158 @@
 import os
-import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Set
+from git import Repo
+from git.exc import GitCommandError
+from app.core.config import settings
+from app.services.file_index import FileIndex
+from app.services.indexer import DirectoryIndexer, IgnoreRules, IGNORE_FILES
+from app.services.detectors import detector_engine
+
+# Bump whenever detection logic changes so cached findings are recomputed
+ENGINE_VERSION = "5"
+
+# Manifest excerpts kept for the AI refinement prompt
+MAX_MANIFEST_EXCERPTS = 6
+MANIFEST_EXCERPT_CHARS = 1200
+
+# Working state kept in the findings for prompts and incremental re-analysis, never stored or returned
+INTERNAL_KEYS = ("file_index", "manifest_excerpts", "ignore_rules", "detector_candidates")
+
+# Files that change the findings without being watched by any detector
+EXTRA_RELEVANT_FILES = ("Dockerfile",)
 
 class AnalysisEngine:
+    def __init__(self):
+        self.indexer = DirectoryIndexer(max_depth=settings.INDEX_MAX_DEPTH, max_files=settings.INDEX_MAX_FILES)
+        self.detectors = detector_engine
+
     def analyze_directory(self, workspace_path: str) -> Dict[str, Any]:
         """
         Deeply analyzes the directory to detect language, framework, and entry points.
         """
         logger.info(f"Performing deep analysis on: {workspace_path}")
         
-        file_index = {
-            "all_files": [],
-            "by_name": {},  # name -> list of full paths
-            "by_extension": {} # .ext -> list of full paths
-        }
+        # 1. Single-pass, pruned indexing
+        rules = self.indexer.load_ignore_rules(workspace_path)
+        file_index, index_stats = self.indexer.index(workspace_path, rules)
+
+        def read_file(rel_path: str) -> Optional[str]:
+            with open(os.path.join(workspace_path, rel_path), "r") as f:
+                return f.read()
+
+        return self._analyze_index(file_index, index_stats, read_file, rules)
+
+    def analyze_git_objects(self, repo_path: str, rev: str = "HEAD") -> Dict[str, Any]:
+        """
+        Analyzes a commit straight from the git object store, without a checked-out working tree.
+        The index comes from `git ls-tree -r` and manifests are read through a persistent `git cat-file --batch`.
+        """
+        logger.info(f"Performing deep analysis on git objects: {repo_path}@{rev}")
+        repo = Repo(repo_path)
+        try:
+            paths = repo.git.ls_tree("-r", "-z", "--name-only", rev).split("\0")
+            read_file = self._object_reader(repo, rev)
+
+            rules = IgnoreRules()
+            for name in IGNORE_FILES:
+                if name in paths:
+                    rules.add_lines((read_file(name) or "").splitlines())
+
+            file_index, index_stats = self.indexer.index_paths(paths, rules)
+            return self._analyze_index(file_index, index_stats, read_file, rules)
+        finally:
+            repo.close()
+
+    def analyze_git_diff(self, repo_path: str, previous: Dict[str, Any], previous_sha: str, rev: str = "HEAD") -> Optional[Dict[str, Any]]:
+        """
+        Re-analyzes `rev` from the full findings of an earlier commit. `git diff --name-status` patches the
+        previous file index in place, and only the detectors and services a relevant change touches are re-run.
+        When no manifest, entry point candidate or Dockerfile changed, the previous findings are kept as they are.
+        Returns None when the previous state cannot be reused (commit not in the clone, ignore files changed,
+        truncated index), so the caller falls back to a full analysis.
+        """
+        file_index = previous.get("file_index")
+        rules = previous.get("ignore_rules")
+        if file_index is None or rules is None or previous.get("index_stats", {}).get("truncated"):
+            return None
+
+        repo = Repo(repo_path)
+        try:
+            try:
+                output = repo.git.diff("--name-status", "-z", "--no-renames", previous_sha, rev)
+            except GitCommandError as e:
+                logger.info(f"Cannot diff against {previous_sha[:7]}, running a full analysis: {e.stderr.strip()}")
+                return None
+            parts = output.split("\0")
+            changes = list(zip(parts[0::2], parts[1::2]))
+            if any(path.rpartition("/")[2] in IGNORE_FILES for _, path in changes):
+                logger.info("Ignore rules changed, running a full analysis")
+                return None
+
+            # 1. Patch the index; content-only changes keep it as is
+            relevant: Set[str] = set()
+            roots_changed = False
+            for status, path in changes:
+                if not self.indexer.accepts(path, rules):
+                    continue
+                rel_dir, _, name = path.rpartition("/")
+                if status == "D":
+                    file_index.remove(path)
+                elif status == "A":
+                    file_index.add(rel_dir, name, ordered=True)
+                if self.is_relevant_change(path):
+                    relevant.add(path)
+                    roots_changed = roots_changed or (status in "AD" and self._is_manifest(name))
+            file_index.compact()
+            if file_index.file_count > self.indexer.max_files:
+                return None
+
+            index_stats = {**previous["index_stats"], "files": file_index.file_count, "changed_files": len(changes)}
+            if not relevant:
+                logger.info(f"Incremental analysis: {len(changes)} changed files, none relevant; keeping previous findings")
+                return {**previous, "index_stats": index_stats, "incremental": True}
+
+            # 2. Re-run what the relevant changes touch
+            logger.info(f"Incremental analysis: {len(relevant)} of {len(changes)} changed files are relevant")
+            findings = self._analyze_index(
+                file_index, index_stats, self._object_reader(repo, rev), rules,
+                previous_candidates=previous.get("detector_candidates"),
+                previous_services=None if roots_changed else previous.get("services"),
+                changed=relevant,
+            )
+            findings["incremental"] = True
+            return findings
+        finally:
+            repo.close()
+
+    @staticmethod
+    def _object_reader(repo: Repo, rev: str) -> Callable[[str], Optional[str]]:
+        # The persistent cat-file process is shared, so service workers must take turns
+        cat_file_lock = threading.Lock()
 
-        # 1. Recursive Indexing
-        for root, _, files in os.walk(workspace_path):
-            rel_root = os.path.relpath(root, workspace_path)
-            if rel_root == ".":
-                rel_root = ""
-                
-            for f in files:
-                full_rel_path = os.path.join(rel_root, f)
-                file_index["all_files"].append(full_rel_path)
-                
-                if f not in file_index["by_name"]:
-                    file_index["by_name"][f] = []
-                file_index["by_name"][f].append(full_rel_path)
-                
-                _, ext = os.path.splitext(f)
-                if ext:
-                    if ext not in file_index["by_extension"]:
-                        file_index["by_extension"][ext] = []
-                    file_index["by_extension"][ext].append(full_rel_path)
+        def read_file(rel_path: str) -> Optional[str]:
+            with cat_file_lock:
+                _, type_name, _, data = repo.git.get_object_data(f"{rev}:{rel_path}")
+            return data.decode("utf-8", errors="replace") if type_name == b"blob" else None
+
+        return read_file
+
+    def is_relevant_change(self, path: str) -> bool:
+        """Whether a change to `path` can change the findings: watched by a detector, a Dockerfile or an ignore file."""
+        name = path.rpartition("/")[2]
+        return self.detectors.is_relevant(path) or name in EXTRA_RELEVANT_FILES or name in IGNORE_FILES
+
+    def _is_manifest(self, name: str) -> bool:
+        return name in self.detectors.manifest_names() or any(name.endswith(ext) for ext in self.detectors.manifest_extensions())
+
+    def _analyze_index(self, file_index: FileIndex, index_stats: Dict[str, Any], read_file: Callable[[str], Optional[str]],
+                       rules: IgnoreRules, previous_candidates: Optional[List[Dict[str, Any]]] = None,
+                       previous_services: Optional[List[Dict[str, Any]]] = None,
+                       changed: Optional[Set[str]] = None) -> Dict[str, Any]:
+        logger.debug(f"Indexed {index_stats['files']} files ({index_stats['pruned_dirs']} dirs pruned, {index_stats['ignored_files']} files ignored)")
 
         findings = {
             "language": "Unknown",
@@ -44,23 +162,34 @@ class AnalysisEngine:
             "confidence": 0.0,
             "detected_files": [],
             "dependencies": [],
-            "file_index": file_index
+            "file_index": file_index,
+            "ignore_rules": rules,
+            "index_stats": index_stats
         }
 
-        # 2. Language & Framework Detection logic
-        self._detect_node(findings, workspace_path)
-        self._detect_python(findings, workspace_path)
-        self._detect_go(findings, workspace_path)
-        self._detect_php(findings, workspace_path)
-        self._detect_ruby(findings, workspace_path)
-        self._detect_swift(findings, workspace_path)
-        self._detect_html(findings, workspace_path)
+        # 2. Language & Framework Detection: one pass fires every matching rule
+        detection = self.detectors.detect(file_index, read_file, previous=previous_candidates, changed=changed)
+        best = detection["best"]
+        if best:
+            for key in ("language", "framework", "entry_point", "confidence", "dependencies"):
+                findings[key] = best[key]
+        for candidate in detection["candidates"]:
+            findings["detected_files"].extend(f for f in candidate["detected_files"] if f not in findings["detected_files"])
+        findings["candidates"] = [
+            {k: c[k] for k in ("language", "framework", "entry_point", "confidence")} for c in detection["candidates"]
+        ]
+        findings["detector_candidates"] = detection["candidates"]
+        findings["detector_report"] = detection["report"]
         
-        # 3. Detect Architecture
-        if "package.json" in file_index["by_name"] and ("requirements.txt" in file_index["by_name"] or "pyproject.toml" in file_index["by_name"]):
+        # 3. Detect Architecture: every directory holding a manifest is a service
+        findings["services"] = self._analyze_services(file_index, read_file, previous_services, changed)
+        if len(findings["services"]) > 1:
             findings["architecture"] = "Monorepo"
 
-        # 4. Final Fallback / Signal logic
+        # 4. Short manifest excerpts, shallowest first, in case AI refinement is needed
+        findings["manifest_excerpts"] = self._manifest_excerpts(file_index, read_file)
+
+        # 5. Final Fallback / Signal logic
         if "Dockerfile" in file_index["by_name"]:
             findings["detected_files"].append("Dockerfile")
             if findings["framework"] == "Unknown":
@@ -70,146 +199,87 @@ class AnalysisEngine:
         logger.info(f"Deep analysis complete: {findings['language']} / {findings['framework']} (Confidence: {findings['confidence']})")
         return findings
 
-    def _detect_node(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        if "package.json" in file_index["by_name"]:
-            findings["language"] = "JavaScript/TypeScript"
-            findings["detected_files"].append("package.json")
-            findings["confidence"] += 0.4
-            
-            # Detect entry points
-            node_entries = ["server.js", "index.js", "app.js", "main.js"]
-            for entry in node_entries:
-                if entry in file_index["by_name"]:
-                    findings["entry_point"] = file_index["by_name"][entry][0]
-                    findings["confidence"] += 0.2
-                    break
+    def _analyze_services(self, file_index: FileIndex, read_file: Callable[[str], Optional[str]],
+                          previous: Optional[List[Dict[str, Any]]] = None, changed: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Discovers project roots and runs the detectors on each subtree concurrently.
+        Files belong to the deepest project root above them, so nested services are not double counted.
+        Given the `previous` services of an unchanged set of roots, only roots owning a `changed` path are re-run.
+        """
+        roots: Set[str] = set()
+        for name in self.detectors.manifest_names():
+            roots.update(path.rpartition("/")[0] for path in file_index.paths_for_name(name))
+        for ext in self.detectors.manifest_extensions():
+            roots.update(path.rpartition("/")[0] for path in file_index.paths_for_extension(ext))
+        if len(roots) < 2:
+            return []
+
+        # Split the index into one sub-index per root in a single pass
+        sub_indexes = {root: FileIndex() for root in roots}
+        owners: Dict[str, Optional[str]] = {}
+
+        def owner(rel_dir: str) -> Optional[str]:
+            if rel_dir not in owners:
+                if rel_dir in roots:
+                    owners[rel_dir] = rel_dir
+                else:
+                    owners[rel_dir] = owner(rel_dir.rpartition("/")[0]) if rel_dir else None
+            return owners[rel_dir]
+
+        for rel_dir, name in file_index.entries():
+            root = owner(rel_dir)
+            if root is not None:
+                sub_dir = rel_dir[len(root) + 1:] if root else rel_dir
+                sub_indexes[root].add(sub_dir, name)
 
+        reusable = {s["path"]: s for s in previous or ()} if changed is not None else {}
+        dirty = {owner(path.rpartition("/")[0]) for path in changed or ()}
+
+        def analyze(root: str) -> Optional[Dict[str, Any]]:
+            if root not in dirty and (root or ".") in reusable:
+                return {**reusable[root or "."], "file_count": sub_indexes[root].file_count}
+            service_read = (lambda p: read_file(f"{root}/{p}")) if root else read_file
+            best = self.detectors.detect(sub_indexes[root], service_read)["best"]
+            if not best:
+                return None
+            return {
+                "name": self._service_name(root),
+                "path": root or ".",
+                "language": best["language"],
+                "framework": best["framework"],
+                "entry_point": best["entry_point"],
+                "confidence": best["confidence"],
+                "detected_files": best["detected_files"],
+                "dependencies": best["dependencies"],
+                "file_count": sub_indexes[root].file_count,
+            }
+
+        workers = max(1, min(len(roots), settings.SERVICE_ANALYSIS_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service-analysis") as pool:
+            services = [s for s in pool.map(analyze, sorted(roots)) if s]
+        logger.info(f"Discovered {len(services)} services: {', '.join(s['path'] for s in services)}")
+        return services
+
+    def _manifest_excerpts(self, file_index: FileIndex, read_file: Callable[[str], Optional[str]]) -> Dict[str, str]:
+        paths = [p for name in self.detectors.manifest_names() for p in file_index.paths_for_name(name)]
+        paths += [p for ext in self.detectors.manifest_extensions() for p in file_index.paths_for_extension(ext)]
+        excerpts = {}
+        for path in sorted(paths, key=lambda p: (p.count("/"), p))[:MAX_MANIFEST_EXCERPTS]:
             try:
-                # Use the first package.json found (usually root)
-                pkg_path = os.path.join(workspace_path, file_index["by_name"]["package.json"][0])
-                with open(pkg_path, "r") as f:
-                    pkg_data = json.load(f)
-                    deps = {**pkg_data.get("dependencies", {}), **pkg_data.get("devDependencies", {})}
-                    findings["dependencies"] = list(deps.keys())
-                    
-                    if "next" in deps: findings["framework"] = "Next.js"
-                    elif "react" in deps: findings["framework"] = "React"
-                    elif "vue" in deps: findings["framework"] = "Vue"
-                    elif "express" in deps: findings["framework"] = "Express"
-                    elif "nest" in deps: findings["framework"] = "NestJS"
-                    else: findings["framework"] = "Node.js (Generic)"
-                    
-                    if findings["framework"] != "Unknown":
-                        findings["confidence"] += 0.3
+                excerpts[path] = (read_file(path) or "")[:MANIFEST_EXCERPT_CHARS]
             except Exception as e:
-                logger.error(f"Error parsing package.json: {e}")
-
-    def _detect_python(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        python_signals = ["requirements.txt", "pyproject.toml", "setup.py", "Pipfile", "poetry.lock", "manage.py"]
-        detected_signals = [s for s in python_signals if s in file_index["by_name"]]
-        
-        if detected_signals:
-            findings["language"] = "Python"
-            findings["detected_files"].extend(detected_signals)
-            findings["confidence"] += 0.4
-            
-            # Detect entry points
-            py_entries = ["app.py", "main.py", "wsgi.py", "asgi.py", "manage.py"]
-            for entry in py_entries:
-                if entry in file_index["by_name"]:
-                    findings["entry_point"] = file_index["by_name"][entry][0]
-                    findings["confidence"] += 0.2
-                    break
-            
-            # Framework Specifics
-            if "manage.py" in file_index["by_name"]:
-                findings["framework"] = "Django"
-                findings["confidence"] += 0.3
-            elif "requirements.txt" in file_index["by_name"]:
-                try:
-                    req_path = os.path.join(workspace_path, file_index["by_name"]["requirements.txt"][0])
-                    with open(req_path, "r") as f:
-                        content = f.read().lower()
-                        if "fastapi" in content: findings["framework"] = "FastAPI"
-                        elif "flask" in content: findings["framework"] = "Flask"
-                        elif "django" in content: findings["framework"] = "Django"
-                        
-                        if findings["framework"] != "Unknown":
-                            findings["confidence"] += 0.3
-                except: pass
+                logger.debug(f"Could not read manifest {path}: {e}")
+        return excerpts
 
-            if findings["framework"] == "Unknown":
-                if "poetry.lock" in file_index["by_name"] or "pyproject.toml" in file_index["by_name"]:
-                    findings["framework"] = "Python (Modern/Poetry)"
-                else:
-                    findings["framework"] = "Python (Generic)"
-
-    def _detect_go(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        if "go.mod" in file_index["by_name"]:
-            findings["language"] = "Go"
-            findings["detected_files"].append("go.mod")
-            findings["framework"] = "Go (Modules)"
-            findings["confidence"] += 0.6
-            
-            if "main.go" in file_index["by_name"]:
-                findings["entry_point"] = file_index["by_name"]["main.go"][0]
-                findings["confidence"] += 0.2
-
-    def _detect_php(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        if "composer.json" in file_index["by_name"] or ".php" in file_index["by_extension"]:
-            findings["language"] = "PHP"
-            findings["confidence"] = max(findings["confidence"], 0.6)
-            
-            if "composer.json" in file_index["by_name"]:
-                findings["detected_files"].append("composer.json")
-                findings["framework"] = "PHP (Composer)"
-            
-            php_entries = ["index.php", "server.php", "app.php"]
-            for entry in php_entries:
-                if entry in file_index["by_name"]:
-                    findings["entry_point"] = file_index["by_name"][entry][0]
-                    findings["confidence"] += 0.2
-                    break
-
-    def _detect_ruby(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        if "Gemfile" in file_index["by_name"] or ".rb" in file_index["by_extension"]:
-            findings["language"] = "Ruby"
-            findings["confidence"] = max(findings["confidence"], 0.6)
-            
-            if "Gemfile" in file_index["by_name"]:
-                findings["detected_files"].append("Gemfile")
-                findings["framework"] = "Ruby (Bundler)"
-            
-            if "config.ru" in file_index["by_name"]:
-                findings["entry_point"] = "config.ru"
-
-    def _detect_swift(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        if "Package.swift" in file_index["by_name"] or ".swift" in file_index["by_extension"]:
-            findings["language"] = "Swift"
-            findings["confidence"] = max(findings["confidence"], 0.6)
-            
-            if "Package.swift" in file_index["by_name"]:
-                findings["detected_files"].append("Package.swift")
-                findings["framework"] = "Swift (Server-side)"
-
-    def _detect_html(self, findings: dict, workspace_path: str):
-        file_index = findings["file_index"]
-        # Only detect as HTML if no other major language was found
-        if findings["language"] == "Unknown" and ".html" in file_index["by_extension"]:
-            findings["language"] = "HTML/Static"
-            findings["framework"] = "Static Website"
-            findings["confidence"] = 0.5
-            
-            if "index.html" in file_index["by_name"]:
-                findings["entry_point"] = file_index["by_name"]["index.html"][0]
-                findings["confidence"] += 0.2
+    @staticmethod
+    def _service_name(root: str) -> str:
+        name = re.sub(r"[^a-z0-9_-]+", "-", root.lower()).strip("-")
+        return name or "app"
 
-        return findings
+    def summarize(self, findings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the findings without the bulky file index and prompt material, suitable for storing or returning to clients.
+        """
+        return {k: v for k, v in findings.items() if k not in INTERNAL_KEYS}
 
 analysis_engine = AnalysisEngine()
@@ -0,0 +1,100 @@
+import statistics
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """
+    Sliding-window circuit breaker for one AI provider.
+
+    The circuit opens when, over the last `window` calls (and at least `min_calls`), the failure rate
+    reaches `failure_rate` or the share of calls slower than `slow_call_seconds` reaches `slow_call_rate`.
+    After `open_seconds` a single half-open probe is let through: success closes the circuit, failure
+    re-opens it. The same window provides the latency and success figures used to order providers.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 15.0, slow_call_rate: float = 0.8, open_seconds: float = 60.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.calls: Deque[Tuple[bool, float]] = deque(maxlen=window)  # (success, latency)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. In half-open state this claims the single probe."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN:
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def release(self):
+        """Gives back a half-open probe whose call was abandoned without an outcome (e.g. a cancelled hedge)."""
+        self.probe_in_flight = False
+
+    def record(self, success: bool, latency: float):
+        slow = latency >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+            if success and not slow:
+                self.state = CLOSED
+                self.calls.clear()
+                self.calls.append((success, latency))
+            else:
+                self._open()
+            return
+
+        self.calls.append((success, latency))
+        if self.state == CLOSED and len(self.calls) >= self.min_calls:
+            failures = sum(1 for ok, _ in self.calls if not ok) / len(self.calls)
+            slow_calls = sum(1 for _, elapsed in self.calls if elapsed >= self.slow_call_seconds) / len(self.calls)
+            if failures >= self.failure_rate or slow_calls >= self.slow_call_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        if not self.calls:
+            return None
+        return sum(1 for ok, _ in self.calls if ok) / len(self.calls)
+
+    @property
+    def p50_latency(self) -> Optional[float]:
+        latencies = [elapsed for ok, elapsed in self.calls if ok]
+        return statistics.median(latencies) if latencies else None
+
+    def expected_cost(self) -> float:
+        """
+        Median latency inflated by the failure rate: roughly the seconds a call to this provider costs.
+        Providers without enough history rank behind measured ones.
+        """
+        if len(self.calls) < self.min_calls or self.p50_latency is None:
+            return float("inf")
+        return self.p50_latency / max(self.success_rate, 0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.p50_latency
+        success_rate = self.success_rate
+        return {
+            "state": self.state,
+            "calls": len(self.calls),
+            "success_rate": round(success_rate, 3) if success_rate is not None else None,
+            "p50_latency": round(p50, 3) if p50 is not None else None,
+        }
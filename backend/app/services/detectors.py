@@ -0,0 +1,340 @@
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+from app.services.file_index import FileIndex
+
+# A manifest parser turns file content into {"framework": ..., "dependencies": [...]}; both keys optional
+ManifestParser = Callable[[str], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class DetectorRule:
+    """
+    Declarative description of how to recognise one language/toolchain.
+
+    The rule fires when any `signal_files` name or `extensions` extension is present. The framework is
+    decided by, in order: `framework_files` (name -> framework), the first `manifests` entry parsed by
+    `parser`, `fallback_frameworks`, then `default_framework`. Manifests starting with "." are extensions.
+    """
+    language: str
+    signal_files: Tuple[str, ...] = ()
+    extensions: Tuple[str, ...] = ()
+    entry_points: Tuple[str, ...] = ()
+    manifests: Tuple[str, ...] = ()
+    parser: Optional[ManifestParser] = None
+    framework_files: Tuple[Tuple[str, str], ...] = ()
+    fallback_frameworks: Tuple[Tuple[str, str], ...] = ()
+    default_framework: Optional[str] = None
+    signal_confidence: float = 0.4
+    entry_confidence: float = 0.2
+    framework_confidence: float = 0.3
+    priority: int = 0  # Breaks confidence ties; higher wins
+    fallback: bool = False  # Only considered when no regular rule fired
+    watched_files: Tuple[str, ...] = field(init=False, default=())
+
+    def __post_init__(self):
+        names = self.signal_files + self.entry_points + tuple(m for m in self.manifests if not m.startswith("."))
+        names += tuple(n for n, _ in self.framework_files + self.fallback_frameworks)
+        object.__setattr__(self, "watched_files", tuple(dict.fromkeys(names)))
+
+
+# --- Manifest parsers --------------------------------------------------------
+
+def parse_package_json(content: str) -> Dict[str, Any]:
+    pkg_data = json.loads(content)
+    deps = {**pkg_data.get("dependencies", {}), **pkg_data.get("devDependencies", {})}
+    framework = "Node.js (Generic)"
+    for dep, name in (("next", "Next.js"), ("react", "React"), ("vue", "Vue"), ("express", "Express"), ("nest", "NestJS")):
+        if dep in deps:
+            framework = name
+            break
+    return {"framework": framework, "dependencies": list(deps.keys())}
+
+def parse_requirements(content: str) -> Dict[str, Any]:
+    content = content.lower()
+    for dep, name in (("fastapi", "FastAPI"), ("flask", "Flask"), ("django", "Django")):
+        if dep in content:
+            return {"framework": name}
+    return {}
+
+def parse_cargo_toml(content: str) -> Dict[str, Any]:
+    for dep, name in (("actix-web", "Actix Web"), ("axum", "Axum"), ("rocket", "Rocket")):
+        if re.search(rf"^\s*{re.escape(dep)}\s*=", content, re.MULTILINE):
+            return {"framework": name}
+    return {}
+
+def parse_jvm_build(content: str) -> Dict[str, Any]:
+    if "spring-boot" in content:
+        return {"framework": "Spring Boot"}
+    if "quarkus" in content:
+        return {"framework": "Quarkus"}
+    return {}
+
+def parse_csproj(content: str) -> Dict[str, Any]:
+    if "Microsoft.NET.Sdk.Web" in content:
+        return {"framework": "ASP.NET Core"}
+    return {}
+
+
+# --- Registry ----------------------------------------------------------------
+
+DEFAULT_RULES: Tuple[DetectorRule, ...] = (
+    DetectorRule(
+        language="JavaScript/TypeScript",
+        signal_files=("package.json",),
+        entry_points=("server.js", "index.js", "app.js", "main.js"),
+        manifests=("package.json",),
+        parser=parse_package_json,
+        priority=0,
+    ),
+    DetectorRule(
+        language="Python",
+        signal_files=("requirements.txt", "pyproject.toml", "setup.py", "Pipfile", "poetry.lock", "manage.py"),
+        entry_points=("app.py", "main.py", "wsgi.py", "asgi.py", "manage.py"),
+        manifests=("requirements.txt",),
+        parser=parse_requirements,
+        framework_files=(("manage.py", "Django"),),
+        fallback_frameworks=(("poetry.lock", "Python (Modern/Poetry)"), ("pyproject.toml", "Python (Modern/Poetry)")),
+        default_framework="Python (Generic)",
+        priority=1,
+    ),
+    DetectorRule(
+        language="Go",
+        signal_files=("go.mod",),
+        entry_points=("main.go",),
+        default_framework="Go (Modules)",
+        signal_confidence=0.6,
+        priority=2,
+    ),
+    DetectorRule(
+        language="PHP",
+        signal_files=("composer.json",),
+        extensions=(".php",),
+        entry_points=("index.php", "server.php", "app.php"),
+        fallback_frameworks=(("composer.json", "PHP (Composer)"),),
+        signal_confidence=0.6,
+        priority=3,
+    ),
+    DetectorRule(
+        language="Ruby",
+        signal_files=("Gemfile",),
+        extensions=(".rb",),
+        entry_points=("config.ru",),
+        fallback_frameworks=(("Gemfile", "Ruby (Bundler)"),),
+        signal_confidence=0.6,
+        priority=4,
+    ),
+    DetectorRule(
+        language="Swift",
+        signal_files=("Package.swift",),
+        extensions=(".swift",),
+        fallback_frameworks=(("Package.swift", "Swift (Server-side)"),),
+        signal_confidence=0.6,
+        priority=5,
+    ),
+    DetectorRule(
+        language="Rust",
+        signal_files=("Cargo.toml",),
+        entry_points=("main.rs",),
+        manifests=("Cargo.toml",),
+        parser=parse_cargo_toml,
+        default_framework="Rust (Cargo)",
+        signal_confidence=0.6,
+        priority=6,
+    ),
+    DetectorRule(
+        language="Java",
+        signal_files=("pom.xml", "build.gradle", "build.gradle.kts"),
+        entry_points=("Application.java", "Main.java"),
+        manifests=("pom.xml", "build.gradle", "build.gradle.kts"),
+        parser=parse_jvm_build,
+        fallback_frameworks=(("pom.xml", "Java (Maven)"), ("build.gradle", "Java (Gradle)"), ("build.gradle.kts", "Java (Gradle)")),
+        signal_confidence=0.5,
+        priority=7,
+    ),
+    DetectorRule(
+        language="C#/.NET",
+        extensions=(".csproj", ".sln"),
+        entry_points=("Program.cs",),
+        manifests=(".csproj",),
+        parser=parse_csproj,
+        default_framework=".NET",
+        signal_confidence=0.5,
+        priority=8,
+    ),
+    DetectorRule(
+        language="HTML/Static",
+        extensions=(".html",),
+        entry_points=("index.html",),
+        default_framework="Static Website",
+        signal_confidence=0.5,
+        framework_confidence=0.0,
+        fallback=True,
+    ),
+)
+
+
+class DetectorEngine:
+    """
+    Compiles detector rules into one name/extension lookup table, so a single pass over the
+    distinct names and extensions of a file index fires every matching rule at once.
+    Adding a language is a new `DetectorRule`, not another pass.
+    """
+
+    def __init__(self, rules: Tuple[DetectorRule, ...] = DEFAULT_RULES):
+        self.rules = rules
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_ext: Dict[str, List[int]] = {}
+        for i, rule in enumerate(rules):
+            for name in rule.watched_files:
+                self._by_name.setdefault(name, []).append(i)
+            for ext in rule.extensions + tuple(m for m in rule.manifests if m.startswith(".")):
+                self._by_ext.setdefault(ext, []).append(i)
+
+    def watched_files(self) -> List[str]:
+        """All file names any rule looks at."""
+        return list(self._by_name)
+
+    def watched_extensions(self) -> List[str]:
+        return list(self._by_ext)
+
+    def manifest_names(self) -> List[str]:
+        """File names that mark the root of a project (signal files of non-fallback rules)."""
+        return list(dict.fromkeys(n for r in self.rules if not r.fallback for n in r.signal_files))
+
+    def entry_point_names(self) -> List[str]:
+        """File names any rule considers an entry point candidate."""
+        return list(dict.fromkeys(e for r in self.rules for e in r.entry_points))
+
+    def manifest_extensions(self) -> List[str]:
+        """Extensions of manifests that mark the root of a project, e.g. `.csproj`."""
+        return list(dict.fromkeys(m for r in self.rules if not r.fallback for m in r.manifests if m.startswith(".")))
+
+    def is_relevant(self, path: str) -> bool:
+        """Whether a change to `path` could change the outcome of any rule."""
+        name = path.rsplit("/", 1)[-1]
+        if name in self._by_name:
+            return True
+        dot = name.rfind(".")
+        return dot > 0 and name[dot:] in self._by_ext
+
+    def affected_rules(self, paths: Iterable[str]) -> Set[int]:
+        """Indexes of the rules whose outcome a change to any of `paths` could alter."""
+        affected: Set[int] = set()
+        for path in paths:
+            name = path.rsplit("/", 1)[-1]
+            affected.update(self._by_name.get(name, ()))
+            dot = name.rfind(".")
+            if dot > 0:
+                affected.update(self._by_ext.get(name[dot:], ()))
+        return affected
+
+    def detect(self, file_index: FileIndex, read_file: Callable[[str], Optional[str]],
+               previous: Optional[List[Dict[str, Any]]] = None, changed: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Runs every rule against the index. Returns the best candidate, all candidates and a firing report.
+        With the `previous` candidates and the `changed` paths since they were computed, only rules
+        affected by a change are evaluated again; the others keep their previous candidate.
+        """
+        start = time.perf_counter()
+        affected = self.affected_rules(changed) if changed is not None else None
+        reusable = {c["language"]: c for c in previous or ()}
+        present: Dict[int, Set[str]] = {}
+        ext_hits: Dict[int, Set[str]] = {}
+
+        # 1. One pass over distinct names and extensions
+        by_name, by_ext = self._by_name, self._by_ext
+        for name in file_index.names():
+            for i in by_name.get(name, ()):
+                present.setdefault(i, set()).add(name)
+        for ext in file_index.extensions():
+            for i in by_ext.get(ext, ()):
+                ext_hits.setdefault(i, set()).add(ext)
+        scan_ms = (time.perf_counter() - start) * 1000
+
+        # 2. Evaluate fired rules
+        candidates = []
+        report = []
+        for i, rule in enumerate(self.rules):
+            names = present.get(i, set())
+            exts = ext_hits.get(i, set())
+            signals = [s for s in rule.signal_files if s in names]
+            if not signals and not (exts & set(rule.extensions)):
+                continue
+            rule_start = time.perf_counter()
+            reused = affected is not None and i not in affected and rule.language in reusable
+            if reused:
+                candidate = reusable[rule.language]
+            else:
+                candidate = self._evaluate(rule, signals, names, exts, file_index, read_file)
+            candidates.append(candidate)
+            report.append({
+                "rule": rule.language,
+                "matched": sorted(names | exts),
+                "ms": round((time.perf_counter() - rule_start) * 1000, 3),
+                "reused": reused,
+            })
+
+        regular = [c for c in candidates if not c["fallback"]]
+        pool = regular or candidates
+        best = max(pool, key=lambda c: (c["confidence"], c["priority"])) if pool else None
+        return {
+            "best": best,
+            "candidates": candidates,
+            "report": {"scan_ms": round(scan_ms, 3), "rules": report},
+        }
+
+    def _evaluate(self, rule: DetectorRule, signals: List[str], names: Set[str], exts: Set[str],
+                  file_index: FileIndex, read_file: Callable[[str], Optional[str]]) -> Dict[str, Any]:
+        candidate = {
+            "language": rule.language,
+            "framework": "Unknown",
+            "entry_point": None,
+            "confidence": rule.signal_confidence,
+            "detected_files": signals,
+            "dependencies": [],
+            "priority": rule.priority,
+            "fallback": rule.fallback,
+        }
+
+        for entry in rule.entry_points:
+            if entry in names:
+                candidate["entry_point"] = file_index.paths_for_name(entry)[0]
+                candidate["confidence"] += rule.entry_confidence
+                break
+
+        framework = next((fw for name, fw in rule.framework_files if name in names), None)
+        if framework is None and rule.parser:
+            manifest_path = self._first_manifest(rule, names, exts, file_index)
+            if manifest_path:
+                try:
+                    parsed = rule.parser(read_file(manifest_path) or "")
+                    framework = parsed.get("framework")
+                    candidate["dependencies"] = parsed.get("dependencies", [])
+                except Exception as e:
+                    logger.error(f"Error parsing {manifest_path}: {e}")
+        if framework is not None:
+            candidate["confidence"] += rule.framework_confidence
+        else:
+            framework = next((fw for name, fw in rule.fallback_frameworks if name in names), rule.default_framework)
+
+        candidate["framework"] = framework or "Unknown"
+        candidate["confidence"] = round(min(candidate["confidence"], 1.0), 2)
+        return candidate
+
+    @staticmethod
+    def _first_manifest(rule: DetectorRule, names: Set[str], exts: Set[str], file_index: FileIndex) -> Optional[str]:
+        for manifest in rule.manifests:
+            if manifest.startswith("."):
+                if manifest in exts:
+                    return file_index.paths_for_extension(manifest)[0]
+            elif manifest in names:
+                # Shallowest copy first, i.e. the repository root when there is one
+                return file_index.paths_for_name(manifest)[0]
+        return None
+
+
+detector_engine = DetectorEngine()
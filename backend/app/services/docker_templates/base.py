@@ -7,6 +7,10 @@ class DockerTemplate(ABC):
         """Generates the Dockerfile content."""
         pass
 
+    def get_port(self, findings: Dict[str, Any]) -> int:
+        """Returns the port the generated container listens on."""
+        return 8000
+
     def generate_dockerignore(self, findings: Dict[str, Any]) -> str:
         """Generates the .dockerignore content."""
         return (
@@ -5,8 +5,7 @@ class NodeDockerTemplate(DockerTemplate):
     def generate_dockerfile(self, findings: Dict[str, Any]) -> str:
         framework = findings.get("framework", "Node.js (Generic)")
         
-        # Determine port - logic can be improved
-        port = 3000
+        port = self.get_port(findings)
         
         content = [
             "FROM node:20-slim AS builder",
@@ -28,3 +27,7 @@ class NodeDockerTemplate(DockerTemplate):
         ]
 
         return "\n".join(content)
+
+    def get_port(self, findings: Dict[str, Any]) -> int:
+        # Determine port - logic can be improved
+        return 3000
@@ -7,14 +7,7 @@ class PythonDockerTemplate(DockerTemplate):
         framework = findings.get("framework", "Python (Generic)")
         entry_point = findings.get("entry_point", "main.py")
         
-        # Determine port
-        port = 8000
-        if framework == "Django":
-            port = 8000
-        elif framework == "FastAPI":
-            port = 8000
-        elif framework == "Flask":
-            port = 5000
+        port = self.get_port(findings)
 
         content = [
             "# Multi-stage build for efficiency",
@@ -45,12 +38,12 @@ class PythonDockerTemplate(DockerTemplate):
 
         if framework == "FastAPI":
             # Strip file extension for uvicorn
-            module = os.path.splitext(entry_point)[0].replace(os.path.sep, ".")
+            module = os.path.splitext(entry_point)[0].replace(os.path.sep, ".").replace("/", ".")
             content.append(f'CMD ["uvicorn", "{module}:app", "--host", "0.0.0.0", "--port", "{port}"]')
         elif framework == "Django":
             content.append(f'CMD ["python", "{entry_point}", "runserver", "0.0.0.0:{port}"]')
         elif framework == "Flask":
-            module = os.path.splitext(entry_point)[0].replace(os.path.sep, ".")
+            module = os.path.splitext(entry_point)[0].replace(os.path.sep, ".").replace("/", ".")
             content.append(f'ENV FLASK_APP={module}')
             content.append(f'CMD ["flask", "run", "--host=0.0.0.0", "--port={port}"]')
         else:
@@ -61,3 +54,9 @@ class PythonDockerTemplate(DockerTemplate):
         # content.append(f"HEALTHCHECK --interval=30s --timeout=3s CMD curl --fail http://localhost:{port}/health || exit 1")
 
         return "\n".join(content)
+
+    def get_port(self, findings: Dict[str, Any]) -> int:
+        # Determine port
+        if findings.get("framework") == "Flask":
+            return 5000
+        return 8000
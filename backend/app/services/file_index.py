@@ -0,0 +1,369 @@
+import os
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from collections.abc import Mapping
+
+_NO_EXT = -1
+_UNKNOWN_EXT = -2
+_REMOVED = 0xFFFFFFFF  # `_file_dir` of a removed file
+
+
+class FileIndex(Mapping):
+    """
+    Compact, array-backed index of the files in a repository.
+
+    Every distinct path segment (file or directory name) is stored once in a single UTF-8
+    buffer and referred to by an integer id. Directories are interned as a trie of
+    (parent dir id, segment id) and each file is just a (dir id, name id) pair. Files sharing
+    a name or an extension are chained through integer arrays, so lookups go through
+    integer-id maps and never materialize full paths.
+
+    It behaves like the original dict (`all_files`, `by_name`, `by_extension`) for the detectors;
+    paths are only built when a view is read, and `to_dict()` serializes on demand.
+    Files can be patched in and out (`add(..., ordered=True)`, `remove`) for incremental re-analysis;
+    removed files leave a tombstone id behind.
+    """
+
+    __slots__ = (
+        "_seg_buf", "_seg_offsets", "_seg_ids", "_seg_overflow",
+        "_name_ext", "_name_first", "_name_last", "_name_files",
+        "_dir_parent", "_dir_segment", "_dir_ids", "_last_dir",
+        "_exts", "_ext_ids", "_ext_first", "_ext_last",
+        "_file_dir", "_file_name", "_name_next", "_ext_next", "_removed",
+    )
+
+    def __init__(self):
+        # Segments: segment i spans _seg_buf[offsets[i]:offsets[i + 1]]
+        self._seg_buf = bytearray()
+        self._seg_offsets = array("I", [0])
+        self._seg_ids: Dict[int, int] = {}  # crc32(segment) -> id; stable across processes, unlike hash()
+        self._seg_overflow: Dict[str, int] = {}  # only for segments whose crc32 collides
+        # Per segment, when used as a file name
+        self._name_ext = array("i")
+        self._name_first = array("i")
+        self._name_last = array("i")
+        self._name_files = 0  # number of segments used as a file name
+        # Directories: dir 0 is the repository root
+        self._dir_parent = array("i", [-1])
+        self._dir_segment = array("i", [-1])
+        self._dir_ids: Optional[Dict[int, int]] = {}  # (parent id << 32 | segment id) -> dir id, build-time only
+        self._last_dir = ("", 0)  # files arrive grouped by directory
+        # Extensions (few, kept as plain strings)
+        self._exts: List[str] = []
+        self._ext_ids: Dict[str, int] = {}
+        self._ext_first = array("i")
+        self._ext_last = array("i")
+        # Files
+        self._file_dir = array("I")
+        self._file_name = array("I")
+        self._name_next = array("i")
+        self._ext_next = array("i")
+        self._removed = 0
+
+    # --- Building ---------------------------------------------------------
+
+    def add(self, rel_dir: str, name: str, ordered: bool = False) -> int:
+        """
+        Adds the file `rel_dir/name` (POSIX separators, "" for the root) and returns its file id.
+        Files normally arrive shallowest first; `ordered` inserts a late file at its shallowest-first
+        position in the name and extension chains instead of appending it.
+        """
+        file_id = len(self._file_dir)
+        dir_id = self._intern_dir(rel_dir)
+        name_id = self._intern_segment(name)
+
+        self._file_dir.append(dir_id)
+        self._file_name.append(name_id)
+        self._name_next.append(-1)
+        self._ext_next.append(-1)
+        if self._name_first[name_id] < 0:
+            self._name_files += 1
+        chain = self._chain_ordered if ordered else self._chain
+        chain(self._name_first, self._name_last, self._name_next, name_id, file_id)
+
+        ext_id = self._name_ext[name_id]
+        if ext_id == _UNKNOWN_EXT:
+            ext_id = self._name_ext[name_id] = self._intern_ext(name)
+        if ext_id != _NO_EXT:
+            chain(self._ext_first, self._ext_last, self._ext_next, ext_id, file_id)
+        return file_id
+
+    def remove(self, rel_path: str) -> bool:
+        """
+        Unlinks the file at `rel_path` from every lookup. Returns False if it is not indexed.
+        """
+        rel_dir, _, name = rel_path.rpartition("/")
+        name_id = self._name_id(name)
+        if name_id is None:
+            return False
+        prev, file_id = -1, self._name_first[name_id]
+        while file_id >= 0 and self._dir_path(self._file_dir[file_id]) != rel_dir:
+            prev, file_id = file_id, self._name_next[file_id]
+        if file_id < 0:
+            return False
+
+        self._unlink(self._name_first, self._name_last, self._name_next, name_id, prev, file_id)
+        if self._name_first[name_id] < 0:
+            self._name_files -= 1
+        ext_id = self._name_ext[name_id]
+        if ext_id >= 0:
+            prev, current = -1, self._ext_first[ext_id]
+            while current != file_id:
+                prev, current = current, self._ext_next[current]
+            self._unlink(self._ext_first, self._ext_last, self._ext_next, ext_id, prev, file_id)
+        self._file_dir[file_id] = _REMOVED
+        self._removed += 1
+        return True
+
+    @staticmethod
+    def _chain(first: array, last: array, nxt: array, key: int, file_id: int):
+        if first[key] < 0:
+            first[key] = file_id
+        else:
+            nxt[last[key]] = file_id
+        last[key] = file_id
+
+    def _chain_ordered(self, first: array, last: array, nxt: array, key: int, file_id: int):
+        order = self._order_key(file_id)
+        prev, current = -1, first[key]
+        while current >= 0 and self._order_key(current) <= order:
+            prev, current = current, nxt[current]
+        nxt[file_id] = current
+        if prev < 0:
+            first[key] = file_id
+        else:
+            nxt[prev] = file_id
+        if current < 0:
+            last[key] = file_id
+
+    def _order_key(self, file_id: int) -> Tuple[int, str]:
+        path = self.path(file_id)
+        return path.count("/"), path
+
+    @staticmethod
+    def _unlink(first: array, last: array, nxt: array, key: int, prev: int, file_id: int):
+        following = nxt[file_id]
+        if prev < 0:
+            first[key] = following
+        else:
+            nxt[prev] = following
+        if last[key] == file_id:
+            last[key] = prev
+        nxt[file_id] = -1
+
+    def _intern_dir(self, rel_dir: str) -> int:
+        if rel_dir == self._last_dir[0]:
+            return self._last_dir[1]
+        if self._dir_ids is None:
+            self._dir_ids = {
+                (self._dir_parent[i] << 32) | self._dir_segment[i]: i for i in range(1, len(self._dir_parent))
+            }
+        dir_id = 0
+        if rel_dir:
+            for segment in rel_dir.split("/"):
+                key = (dir_id << 32) | self._intern_segment(segment)
+                child = self._dir_ids.get(key)
+                if child is None:
+                    child = self._dir_ids[key] = len(self._dir_parent)
+                    self._dir_parent.append(dir_id)
+                    self._dir_segment.append(key & 0xFFFFFFFF)
+                dir_id = child
+        self._last_dir = (rel_dir, dir_id)
+        return dir_id
+
+    def _intern_segment(self, segment: str) -> int:
+        seg_id = self._lookup_segment(segment)
+        if seg_id is not None:
+            return seg_id
+
+        seg_id = len(self._name_ext)
+        h = self._hash(segment)
+        if h in self._seg_ids:
+            self._seg_overflow[segment] = seg_id
+        else:
+            self._seg_ids[h] = seg_id
+        self._seg_buf += segment.encode("utf-8", "surrogateescape")
+        self._seg_offsets.append(len(self._seg_buf))
+        self._name_ext.append(_UNKNOWN_EXT)
+        self._name_first.append(-1)
+        self._name_last.append(-1)
+        return seg_id
+
+    def _intern_ext(self, name: str) -> int:
+        _, ext = os.path.splitext(name)
+        if not ext:
+            return _NO_EXT
+        ext_id = self._ext_ids.get(ext)
+        if ext_id is None:
+            ext_id = self._ext_ids[ext] = len(self._exts)
+            self._exts.append(ext)
+            self._ext_first.append(-1)
+            self._ext_last.append(-1)
+        return ext_id
+
+    def compact(self):
+        """
+        Drops the directory lookup table, which is only needed while adding files.
+        It is rebuilt from the trie arrays if more files are added later.
+        """
+        self._dir_ids = None
+        self._last_dir = ("", 0)
+
+    # --- Lookups ----------------------------------------------------------
+
+    @staticmethod
+    def _hash(segment: str) -> int:
+        return zlib.crc32(segment.encode("utf-8", "surrogateescape"))
+
+    def _segment(self, seg_id: int) -> str:
+        return self._seg_buf[self._seg_offsets[seg_id]:self._seg_offsets[seg_id + 1]].decode("utf-8", "surrogateescape")
+
+    def _lookup_segment(self, segment: str) -> Optional[int]:
+        seg_id = self._seg_ids.get(self._hash(segment))
+        if seg_id is not None and self._segment(seg_id) == segment:
+            return seg_id
+        return self._seg_overflow.get(segment)
+
+    def _name_id(self, name: str) -> Optional[int]:
+        """Segment id of `name` if at least one file has that name."""
+        seg_id = self._lookup_segment(name)
+        return seg_id if seg_id is not None and self._name_first[seg_id] >= 0 else None
+
+    def _dir_path(self, dir_id: int) -> str:
+        parts = []
+        while dir_id > 0:
+            parts.append(self._segment(self._dir_segment[dir_id]))
+            dir_id = self._dir_parent[dir_id]
+        return "/".join(reversed(parts))
+
+    def path(self, file_id: int) -> str:
+        rel_dir = self._dir_path(self._file_dir[file_id])
+        name = self._segment(self._file_name[file_id])
+        return f"{rel_dir}/{name}" if rel_dir else name
+
+    def _walk_chain(self, first: int, nxt: array) -> List[str]:
+        paths = []
+        file_id = first
+        while file_id >= 0:
+            paths.append(self.path(file_id))
+            file_id = nxt[file_id]
+        return paths
+
+    def paths_for_name(self, name: str) -> List[str]:
+        name_id = self._name_id(name)
+        return [] if name_id is None else self._walk_chain(self._name_first[name_id], self._name_next)
+
+    def paths_for_extension(self, ext: str) -> List[str]:
+        ext_id = self._ext_ids.get(ext)
+        return [] if ext_id is None else self._walk_chain(self._ext_first[ext_id], self._ext_next)
+
+    def has_name(self, name: str) -> bool:
+        return self._name_id(name) is not None
+
+    def has_extension(self, ext: str) -> bool:
+        ext_id = self._ext_ids.get(ext)
+        return ext_id is not None and self._ext_first[ext_id] >= 0
+
+    def file_ids(self) -> Sequence[int]:
+        """Ids of the indexed files, skipping removed ones."""
+        if not self._removed:
+            return range(len(self._file_dir))
+        return [i for i in range(len(self._file_dir)) if self._file_dir[i] != _REMOVED]
+
+    def entries(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yields `(rel_dir, name)` for every file, building each directory path only once.
+        """
+        dir_paths: Dict[int, str] = {}
+        for file_id in self.file_ids():
+            dir_id = self._file_dir[file_id]
+            rel_dir = dir_paths.get(dir_id)
+            if rel_dir is None:
+                rel_dir = dir_paths[dir_id] = self._dir_path(dir_id)
+            yield rel_dir, self._segment(self._file_name[file_id])
+
+    @property
+    def file_count(self) -> int:
+        return len(self._file_dir) - self._removed
+
+    def names(self) -> Iterator[str]:
+        """Distinct file names, in order of first appearance."""
+        return (self._segment(i) for i in range(len(self._name_first)) if self._name_first[i] >= 0)
+
+    def name_count(self) -> int:
+        return self._name_files
+
+    def extensions(self) -> List[str]:
+        return [ext for i, ext in enumerate(self._exts) if self._ext_first[i] >= 0]
+
+    # --- Dict-like view for the detectors --------------------------------
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "all_files":
+            return _AllFilesView(self)
+        if key == "by_name":
+            return _LookupView(self, "name")
+        if key == "by_extension":
+            return _LookupView(self, "extension")
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("all_files", "by_name", "by_extension"))
+
+    def __len__(self) -> int:
+        return 3
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Materializes the original plain-dict representation.
+        """
+        return {
+            "all_files": list(self["all_files"]),
+            "by_name": {name: self.paths_for_name(name) for name in self.names()},
+            "by_extension": {ext: self.paths_for_extension(ext) for ext in self.extensions()},
+        }
+
+
+class _AllFilesView(Sequence):
+    __slots__ = ("_index",)
+
+    def __init__(self, index: FileIndex):
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._index.file_count
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[str, List[str]]:
+        ids = self._index.file_ids()
+        if isinstance(item, slice):
+            return [self._index.path(i) for i in ids[item]]
+        return self._index.path(ids[item])
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._index.path(i) for i in self._index.file_ids())
+
+
+class _LookupView(Mapping):
+    __slots__ = ("_index", "_by_name")
+
+    def __init__(self, index: FileIndex, kind: str):
+        self._index = index
+        self._by_name = kind == "name"
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, str):
+            return False
+        return self._index.has_name(key) if self._by_name else self._index.has_extension(key)
+
+    def __getitem__(self, key: str) -> List[str]:
+        paths = self._index.paths_for_name(key) if self._by_name else self._index.paths_for_extension(key)
+        if not paths:
+            raise KeyError(key)
+        return paths
+
+    def __iter__(self) -> Iterator[str]:
+        return self._index.names() if self._by_name else iter(self._index.extensions())
+
+    def __len__(self) -> int:
+        return self._index.name_count() if self._by_name else len(self._index.extensions())
@@ -0,0 +1,103 @@
+import datetime
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from app.core.config import settings
+from app.db.mongodb import db
+from app.services.analysis import ENGINE_VERSION, analysis_engine
+
+
+class FindingsCache:
+    """
+    Two-tier cache of analysis findings keyed by (repo URL, commit SHA, engine version).
+    The in-memory LRU is checked first, then the MongoDB collection when a database is connected.
+    """
+
+    collection_name = "analysis_cache"
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(repo_url: str, commit_sha: str) -> str:
+        normalized = repo_url.strip().rstrip("/").lower()
+        if normalized.endswith(".git"):
+            normalized = normalized[:-4]
+        return hashlib.sha256(f"{normalized}|{commit_sha}|{ENGINE_VERSION}".encode()).hexdigest()
+
+    def _remember(self, key: str, findings: Dict[str, Any]):
+        self._memory[key] = findings
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, repo_url: str, commit_sha: str) -> Optional[Dict[str, Any]]:
+        key = self.make_key(repo_url, commit_sha)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            logger.info(f"Findings cache hit (memory) for {repo_url}@{commit_sha[:7]}")
+            return dict(self._memory[key])
+
+        if db.db is not None:
+            try:
+                doc = await db.db[self.collection_name].find_one({"_id": key})
+                if doc:
+                    self._remember(key, doc["findings"])
+                    logger.info(f"Findings cache hit (mongo) for {repo_url}@{commit_sha[:7]}")
+                    return dict(doc["findings"])
+            except Exception as e:
+                logger.warning(f"Findings cache lookup failed: {e}")
+        return None
+
+    async def set(self, repo_url: str, commit_sha: str, findings: Dict[str, Any]):
+        key = self.make_key(repo_url, commit_sha)
+        stored = analysis_engine.summarize(findings)
+        self._remember(key, stored)
+
+        if db.db is not None:
+            try:
+                await db.db[self.collection_name].replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "repo_url": repo_url,
+                        "commit_sha": commit_sha,
+                        "engine_version": ENGINE_VERSION,
+                        "findings": stored,
+                        "created_at": datetime.datetime.now(datetime.timezone.utc),
+                    },
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to persist findings cache entry: {e}")
+
+
+class AnalysisBaselines:
+    """
+    In-memory LRU of the last full findings per (repo URL, branch), file index included, with the commit
+    they describe. The next analysis of that branch patches them from a `git diff` instead of starting over.
+    A baseline is taken out while it is being patched, so concurrent runs never share one.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._baselines: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+
+    def take(self, repo_url: str, branch: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Removes and returns `(commit_sha, findings)` for the branch, if any."""
+        return self._baselines.pop(FindingsCache.make_key(repo_url, f"branch:{branch}"), None)
+
+    def put(self, repo_url: str, branch: str, commit_sha: str, findings: Dict[str, Any]):
+        if self.max_entries <= 0 or findings.get("file_index") is None:
+            return
+        key = FindingsCache.make_key(repo_url, f"branch:{branch}")
+        self._baselines[key] = (commit_sha, findings)
+        self._baselines.move_to_end(key)
+        while len(self._baselines) > self.max_entries:
+            self._baselines.popitem(last=False)
+
+
+findings_cache = FindingsCache(settings.FINDINGS_CACHE_MAX_ENTRIES)
+analysis_baselines = AnalysisBaselines(settings.INCREMENTAL_MAX_BASELINES if settings.INCREMENTAL_ANALYSIS else 0)
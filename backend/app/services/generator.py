@@ -1,6 +1,7 @@
 from loguru import logger
 import os
-from typing import Dict, Any, Optional
+import yaml
+from typing import Dict, Any, List, Optional
 from .docker_templates.python_template import PythonDockerTemplate
 from .docker_templates.node_template import NodeDockerTemplate
 
@@ -15,8 +16,10 @@ class FileGenerator:
         """
         Generates all necessary deployment files (Dockerfile, .dockerignore) based on analysis findings.
         """
-        success = True
-        
+        services = findings.get("services") or []
+        if len(services) > 1:
+            return self.generate_service_files(workspace_path, services)
+
         # 1. Generate Dockerfile
         df_success = self.generate_dockerfile(workspace_path, findings)
         
@@ -25,6 +28,55 @@ class FileGenerator:
         
         return df_success and di_success
 
+    def generate_service_files(self, workspace_path: str, services: List[Dict[str, Any]]) -> bool:
+        """
+        Generates one Dockerfile and .dockerignore per service plus a docker-compose.yml tying them together.
+        """
+        compose_services = {}
+        host_ports = set()
+        for service in services:
+            service_dir = os.path.join(workspace_path, service["path"])
+            self.generate_dockerfile(service_dir, service)
+            self.generate_dockerignore(service_dir, service)
+
+            if not os.path.exists(os.path.join(service_dir, "Dockerfile")):
+                logger.info(f"Service {service['name']} has no Dockerfile; leaving it out of docker-compose.yml")
+                continue
+            entry = {"build": {"context": f"./{service['path']}" if service["path"] != "." else "."}}
+            strategy = self.strategies.get(service.get("language"))
+            if strategy:
+                # Services often share a default port (8000, 3000), so each gets the next free host port
+                container_port = strategy.get_port(service)
+                host_port = container_port
+                while host_port in host_ports:
+                    host_port += 1
+                host_ports.add(host_port)
+                entry["ports"] = [f"{host_port}:{container_port}"]
+            compose_services[service["name"]] = entry
+
+        return self.generate_compose_file(workspace_path, compose_services)
+
+    def generate_compose_file(self, workspace_path: str, compose_services: Dict[str, Any]) -> bool:
+        """
+        Generates a docker-compose.yml for a multi-service repository.
+        """
+        compose_path = os.path.join(workspace_path, "docker-compose.yml")
+        if not compose_services:
+            logger.warning("No services with a Dockerfile; skipping docker-compose.yml")
+            return False
+        if os.path.exists(compose_path) or os.path.exists(os.path.join(workspace_path, "compose.yaml")):
+            logger.info("Compose file already exists. Skipping generation.")
+            return False
+
+        try:
+            with open(compose_path, "w") as f:
+                yaml.safe_dump({"services": compose_services}, f, sort_keys=False)
+            logger.info(f"Generated docker-compose.yml with {len(compose_services)} services at {compose_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to generate docker-compose.yml: {e}")
+            return False
+
     def generate_dockerfile(self, workspace_path: str, findings: Dict[str, Any]) -> bool:
         """
         Generates a recommended Dockerfile using the appropriate template strategy.
@@ -0,0 +1,220 @@
+import os
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+from loguru import logger
+from app.services.file_index import FileIndex
+
+# Directories that never hold anything the detectors need but can hold hundreds of thousands of files
+DEFAULT_PRUNED_DIRS = frozenset({
+    ".git", ".hg", ".svn",
+    "node_modules", "bower_components", "jspm_packages",
+    "venv", ".venv", "__pycache__", ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache",
+    "dist", "build", "vendor", "target", "Pods", ".next", ".nuxt", ".cache", "coverage",
+    ".idea", ".vscode",
+})
+
+IGNORE_FILES = (".gitignore", ".dockerignore")
+
+
+def _translate(pattern: str) -> str:
+    """Translates a gitignore glob into a regex matched against a relative POSIX path."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+            continue
+        if c == "*":
+            out.append(".*" if pattern.startswith("**", i) else "[^/]*")
+            i += 2 if pattern.startswith("**", i) else 1
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    Subset of gitignore semantics: comments, negation, directory-only and anchored patterns, `*`, `?` and `**`.
+    .dockerignore files are read with the same rules.
+    """
+
+    def __init__(self):
+        self.rules: List[Tuple[Pattern, bool, bool]] = []  # (regex, negated, dir_only)
+
+    def add_lines(self, lines: List[str]):
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+            if not line:
+                continue
+            anchored = line.startswith("/") or "/" in line
+            line = line.lstrip("/")
+            prefix = "" if anchored else "(?:.*/)?"
+            self.rules.append((re.compile(f"^{prefix}{_translate(line)}$"), negated, dir_only))
+
+    def add_file(self, path: str):
+        try:
+            with open(path, "r", errors="ignore") as f:
+                self.add_lines(f.readlines())
+        except OSError as e:
+            logger.debug(f"Could not read ignore file {path}: {e}")
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                ignored = not negated
+        return ignored
+
+
+class DirectoryIndexer:
+    """
+    Builds the analysis `file_index` in a single breadth-first `os.scandir` pass.
+    Heavy directories are pruned before descending, so their contents are never listed.
+    """
+
+    def __init__(self, max_depth: int = 12, max_files: int = 50000, pruned_dirs=DEFAULT_PRUNED_DIRS):
+        self.max_depth = max_depth
+        self.max_files = max_files
+        self.pruned_dirs = pruned_dirs
+
+    def load_ignore_rules(self, workspace_path: str) -> IgnoreRules:
+        rules = IgnoreRules()
+        for name in IGNORE_FILES:
+            path = os.path.join(workspace_path, name)
+            if os.path.isfile(path):
+                rules.add_file(path)
+        return rules
+
+    def accepts(self, rel_path: str, rules: IgnoreRules) -> bool:
+        """Whether `index` or `index_paths` would include the file at `rel_path` (ignoring `max_files`)."""
+        parts = rel_path.split("/")
+        if len(parts) - 1 > self.max_depth:
+            return False
+        for i in range(1, len(parts)):
+            if parts[i - 1] in self.pruned_dirs or rules.is_ignored("/".join(parts[:i]), True):
+                return False
+        return not rules.is_ignored(rel_path, False)
+
+    def _new_index(self) -> Tuple[FileIndex, Dict[str, Any]]:
+        file_index = FileIndex()
+        stats = {"files": 0, "pruned_dirs": 0, "ignored_files": 0, "depth_limited_dirs": 0, "truncated": False}
+        return file_index, stats
+
+    def _add_file(self, file_index: FileIndex, stats: Dict[str, Any], rel_dir: str, name: str):
+        stats["files"] += 1
+        file_index.add(rel_dir, name)
+
+    def index(self, workspace_path: str, rules: Optional[IgnoreRules] = None) -> Tuple[FileIndex, Dict[str, Any]]:
+        """
+        Returns `(file_index, stats)`. Paths are relative to `workspace_path`, shallowest first,
+        so `by_name[name][0]` is the copy closest to the repository root.
+        """
+        rules = rules if rules is not None else self.load_ignore_rules(workspace_path)
+        file_index, stats = self._new_index()
+
+        pending = deque([("", 0)])
+        while pending:
+            rel_root, depth = pending.popleft()
+            try:
+                with os.scandir(os.path.join(workspace_path, rel_root)) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logger.debug(f"Skipping unreadable directory {rel_root}: {e}")
+                continue
+
+            for entry in entries:
+                rel_path = f"{rel_root}/{entry.name}" if rel_root else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in self.pruned_dirs or rules.is_ignored(rel_path, True):
+                        stats["pruned_dirs"] += 1
+                    elif depth + 1 > self.max_depth:
+                        stats["depth_limited_dirs"] += 1
+                    else:
+                        pending.append((rel_path, depth + 1))
+                    continue
+
+                if rules.is_ignored(rel_path, False):
+                    stats["ignored_files"] += 1
+                    continue
+                if stats["files"] >= self.max_files:
+                    stats["truncated"] = True
+                    break
+
+                self._add_file(file_index, stats, rel_root, entry.name)
+
+            if stats["truncated"]:
+                logger.warning(f"File index truncated at {self.max_files} files for {workspace_path}")
+                break
+
+        file_index.compact()
+        return file_index, stats
+
+    def index_paths(self, paths: Iterable[str], rules: Optional[IgnoreRules] = None) -> Tuple[FileIndex, Dict[str, Any]]:
+        """
+        Builds the same `(file_index, stats)` from a flat list of relative POSIX paths,
+        such as the output of `git ls-tree -r`, applying the same pruning and limits.
+        """
+        rules = rules if rules is not None else IgnoreRules()
+        file_index, stats = self._new_index()
+        skipped_dirs: Dict[str, bool] = {"": False}
+
+        def is_skipped(rel_dir: str) -> bool:
+            if rel_dir not in skipped_dirs:
+                parent, _, name = rel_dir.rpartition("/")
+                if is_skipped(parent):
+                    skipped_dirs[rel_dir] = True  # Only the topmost skipped directory is counted
+                elif name in self.pruned_dirs or rules.is_ignored(rel_dir, True):
+                    stats["pruned_dirs"] += 1
+                    skipped_dirs[rel_dir] = True
+                elif rel_dir.count("/") + 1 > self.max_depth:
+                    stats["depth_limited_dirs"] += 1
+                    skipped_dirs[rel_dir] = True
+                else:
+                    skipped_dirs[rel_dir] = False
+            return skipped_dirs[rel_dir]
+
+        for rel_path in sorted((p for p in paths if p), key=lambda p: (p.count("/"), p)):
+            rel_dir, _, name = rel_path.rpartition("/")
+            if is_skipped(rel_dir):
+                continue
+            if rules.is_ignored(rel_path, False):
+                stats["ignored_files"] += 1
+                continue
+            if stats["files"] >= self.max_files:
+                stats["truncated"] = True
+                logger.warning(f"File index truncated at {self.max_files} files")
+                break
+            self._add_file(file_index, stats, rel_dir, name)
+
+        file_index.compact()
+        return file_index, stats
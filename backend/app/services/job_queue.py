@@ -0,0 +1,317 @@
+import asyncio
+import datetime
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.db.mongodb import db
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the number of waiting jobs has reached the queue's limit."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+    max_attempts: int = 3
+    status: str = QUEUED
+    worker_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    available_at: float = 0.0
+    lease_until: float = 0.0
+    error: Optional[str] = None
+
+
+class JobQueue(ABC):
+    """
+    Durable hand-off between the API (which enqueues) and workers (which claim and run jobs).
+
+    A claim takes a lease on the job; a worker that dies stops renewing it and the job becomes
+    claimable again once the lease runs out. Failed jobs are retried after a delay until
+    `max_attempts` is reached.
+    """
+
+    def __init__(self, max_queued: int = 32, lease_seconds: int = 300, max_attempts: int = 3, retry_delay_seconds: int = 30):
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+
+    async def setup(self):
+        """Prepares the backend (indexes). Called once at startup."""
+
+    @abstractmethod
+    async def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> int:
+        """Adds a job and returns its queue position (1-based). Raises `QueueFullError` when full."""
+
+    @abstractmethod
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        """Leases the oldest available job to `worker_id`, or returns None."""
+
+    @abstractmethod
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease; False if the worker no longer holds it."""
+
+    @abstractmethod
+    async def complete(self, job_id: str, worker_id: str):
+        ...
+
+    @abstractmethod
+    async def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Records a failed attempt. Returns True if the job will be retried."""
+
+    @abstractmethod
+    async def reap_expired(self) -> List[str]:
+        """Marks jobs whose lease ran out on their last attempt as failed and returns their ids."""
+
+    @abstractmethod
+    async def position(self, job_id: str) -> Optional[int]:
+        """1-based position among waiting jobs, 0 if running, None if finished or unknown."""
+
+    @abstractmethod
+    async def is_full(self) -> bool:
+        """Whether `enqueue` would currently raise `QueueFullError`."""
+
+    async def wait_for_work(self, timeout: float):
+        """Blocks until a job may be available or `timeout` elapses."""
+        await asyncio.sleep(timeout)
+
+
+class LocalJobQueue(JobQueue):
+    """
+    In-process stand-in with the same claim/lease/retry semantics. Jobs do not survive a restart;
+    use it for development, tests, or a single API process running its own embedded worker.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()  # Insertion order is claim order
+        self._work = asyncio.Event()
+
+    def _waiting(self) -> List[Job]:
+        return [job for job in self._jobs.values() if job.status == QUEUED]
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> int:
+        waiting = len(self._waiting())
+        if waiting >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({waiting} waiting).")
+        job = Job(id=job_id or str(uuid.uuid4()), kind=kind, payload=payload, max_attempts=self.max_attempts)
+        self._jobs[job.id] = job
+        self._work.set()
+        return waiting + 1
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.time()
+        for job in self._jobs.values():
+            available = job.status == QUEUED and job.available_at <= now
+            expired = job.status == RUNNING and job.lease_until < now and job.attempts < job.max_attempts
+            if available or expired:
+                job.status = RUNNING
+                job.worker_id = worker_id
+                job.attempts += 1
+                job.lease_until = now + self.lease_seconds
+                return job
+        self._work.clear()
+        return None
+
+    def _held(self, job_id: str, worker_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return job if job and job.status == RUNNING and job.worker_id == worker_id else None
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        job = self._held(job_id, worker_id)
+        if job:
+            job.lease_until = time.time() + self.lease_seconds
+        return job is not None
+
+    async def complete(self, job_id: str, worker_id: str):
+        if self._held(job_id, worker_id):
+            del self._jobs[job_id]
+
+    async def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        job = self._held(job_id, worker_id)
+        if job is None:
+            return False
+        if job.attempts < job.max_attempts:
+            job.status = QUEUED
+            job.error = error
+            job.available_at = time.time() + self.retry_delay_seconds * job.attempts
+            self._jobs.move_to_end(job_id)
+            self._work.set()
+            return True
+        del self._jobs[job_id]
+        return False
+
+    async def reap_expired(self) -> List[str]:
+        now = time.time()
+        expired = [job.id for job in self._jobs.values()
+                   if job.status == RUNNING and job.lease_until < now and job.attempts >= job.max_attempts]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return expired
+
+    async def position(self, job_id: str) -> Optional[int]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status == RUNNING:
+            return 0
+        return next(i for i, waiting in enumerate(self._waiting(), start=1) if waiting.id == job_id)
+
+    async def is_full(self) -> bool:
+        return len(self._waiting()) >= self.max_queued
+
+    async def wait_for_work(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._work.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class MongoJobQueue(JobQueue):
+    """
+    Jobs stored in MongoDB on the shared Motor client. Claims are a single `find_one_and_update`,
+    so any number of worker processes can pull from the same queue without double-running a job.
+    Job payloads (which may hold access tokens) are removed once a job finishes.
+    """
+
+    collection_name = "jobs"
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise RuntimeError("MongoDB is not connected")
+        return db.db[self.collection_name]
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    async def setup(self):
+        await self.collection.create_index([("status", 1), ("available_at", 1), ("created_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_until", 1)])
+        # Finished jobs are only kept for inspection for a day
+        await self.collection.create_index("finished_at", expireAfterSeconds=24 * 3600)
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> int:
+        waiting = await self.collection.count_documents({"status": QUEUED})
+        if waiting >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({waiting} waiting).")
+        now = self._now()
+        await self.collection.insert_one({
+            "_id": job_id or str(uuid.uuid4()),
+            "kind": kind,
+            "payload": payload,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "created_at": now,
+            "available_at": now,
+        })
+        return waiting + 1
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        now = self._now()
+        doc = await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "available_at": {"$lte": now}},
+                {"status": RUNNING, "lease_until": {"$lt": now}, "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+            ]},
+            {
+                "$set": {"status": RUNNING, "worker_id": worker_id, "lease_until": now + datetime.timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return None
+        return Job(
+            id=doc["_id"],
+            kind=doc["kind"],
+            payload=doc.get("payload", {}),
+            attempts=doc["attempts"],
+            max_attempts=doc["max_attempts"],
+            status=RUNNING,
+            worker_id=worker_id,
+            created_at=doc["created_at"].timestamp(),
+        )
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        result = await self.collection.update_one(
+            {"_id": job_id, "status": RUNNING, "worker_id": worker_id},
+            {"$set": {"lease_until": self._now() + datetime.timedelta(seconds=self.lease_seconds)}},
+        )
+        return result.matched_count == 1
+
+    async def _finish(self, job_id: str, worker_id: str, status: str, error: Optional[str] = None):
+        await self.collection.update_one(
+            {"_id": job_id, "status": RUNNING, "worker_id": worker_id},
+            {"$set": {"status": status, "error": error, "finished_at": self._now()}, "$unset": {"payload": ""}},
+        )
+
+    async def complete(self, job_id: str, worker_id: str):
+        await self._finish(job_id, worker_id, DONE)
+
+    async def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        # One conditional update, so a worker that lost the lease cannot requeue or fail the job
+        now = self._now()
+        retry = {"$lt": ["$attempts", "$max_attempts"]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": job_id, "status": RUNNING, "worker_id": worker_id},
+            [{"$set": {
+                "status": {"$cond": [retry, QUEUED, FAILED]},
+                "error": {"$literal": error},  # Error text starting with "$" would otherwise be read as an expression
+                "available_at": {"$add": [now, {"$multiply": ["$attempts", self.retry_delay_seconds * 1000]}]},
+                "finished_at": {"$cond": [retry, "$$REMOVE", now]},
+                "payload": {"$cond": [retry, "$payload", "$$REMOVE"]},
+            }}],
+            projection={"status": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc is not None and doc["status"] == QUEUED
+
+    async def reap_expired(self) -> List[str]:
+        query = {"status": RUNNING, "lease_until": {"$lt": self._now()}, "$expr": {"$gte": ["$attempts", "$max_attempts"]}}
+        expired = [doc["_id"] async for doc in self.collection.find(query, {"_id": 1})]
+        if expired:
+            await self.collection.update_many(
+                {**query, "_id": {"$in": expired}},
+                {"$set": {"status": FAILED, "error": "Lease expired", "finished_at": self._now()}, "$unset": {"payload": ""}},
+            )
+        return expired
+
+    async def position(self, job_id: str) -> Optional[int]:
+        doc = await self.collection.find_one({"_id": job_id}, {"status": 1, "created_at": 1})
+        if doc is None or doc["status"] in (DONE, FAILED):
+            return None
+        if doc["status"] == RUNNING:
+            return 0
+        return await self.collection.count_documents({"status": QUEUED, "created_at": {"$lt": doc["created_at"]}}) + 1
+
+    async def is_full(self) -> bool:
+        return await self.collection.count_documents({"status": QUEUED}) >= self.max_queued
+
+
+def create_job_queue() -> JobQueue:
+    options = dict(
+        max_queued=settings.PIPELINE_MAX_QUEUE,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        retry_delay_seconds=settings.JOB_RETRY_DELAY_SECONDS,
+    )
+    if settings.JOB_QUEUE == "mongo":
+        return MongoJobQueue(**options)
+    return LocalJobQueue(**options)
+
+job_queue = create_job_queue()
@@ -1,23 +1,194 @@
 import asyncio
-from typing import AsyncGenerator
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncGenerator, Deque, List, Optional, Set, Tuple
 from loguru import logger
+from app.core.config import settings
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+# (seq, level number, task id, time, level name, message); formatted only when delivered
+LogEntry = Tuple[int, int, Optional[str], datetime, str, str]
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    min_level: int
+    task_id: Optional[str]
+    cursor: int  # Last sequence number read; only moved under the streamer's lock
+    dropped: int = 0  # Lines matching the filters that were overwritten before being read
+    gap: bool = False  # Resumed behind the buffer; how many of the missing lines matched is unknown
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+
 
 class LogStreamer:
-    def __init__(self):
-        self.queues = []
+    """
+    Fans log lines out to SSE subscribers from one fixed-size ring buffer.
+
+    Subscribers only hold a cursor (the last sequence number they saw) into the shared buffer, so a
+    slow client costs nothing beyond the buffer itself. When a client falls so far behind that its
+    next line was overwritten, it is either skipped ahead with an "N messages dropped" marker or
+    disconnected, depending on the drop policy. Only overwritten lines that match the subscriber's
+    filters count, so a client following one task is not penalized for the volume of others.
+
+    `push_log` may be called from any thread. Records are stored raw under a lock and subscribers
+    are woken with one `call_soon_threadsafe` per batch, so no asyncio object is touched off the loop.
+
+    While nobody is subscribed, only lines at `idle_level` or above are kept for replay; the sink
+    filter skips everything else (all of it when replay is disabled) before it is formatted.
+    """
+
+    def __init__(self, max_entries: int = 2000, drop_policy: str = DROP_OLDEST, replay_lines: int = 100,
+                 idle_level: str = "INFO"):
+        self.buffer: Deque[LogEntry] = deque(maxlen=max_entries)
+        self.drop_policy = drop_policy
+        self.replay_lines = replay_lines
+        self.idle_min_level = logger.level(idle_level.upper()).no if replay_lines > 0 else None
+        self.seq = 0
+        self.subscribers: Set[_Subscriber] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._wake_pending = False
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.subscribers)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Sets the event loop subscribers live on; wake-ups are scheduled onto it."""
+        self.loop = loop
+
+    def wants_record(self, level_no: int) -> bool:
+        """Cheap check for the sink filter: every record for live subscribers, replayable ones otherwise."""
+        if self.subscribers:
+            return True
+        return self.idle_min_level is not None and level_no >= self.idle_min_level
 
-    async def subscribe(self) -> AsyncGenerator[str, None]:
-        queue = asyncio.Queue()
-        self.queues.append(queue)
+    def push_log(self, time: datetime, level_no: int, level_name: str, message: str, task_id: Optional[str] = None):
+        with self._lock:
+            self.seq += 1
+            if self.subscribers and len(self.buffer) == self.buffer.maxlen:
+                self._count_drop(self.buffer[0])
+            self.buffer.append((self.seq, level_no, task_id, time, level_name, message))
+            if not self.subscribers or self._wake_pending or self.loop is None:
+                return
+            self._wake_pending = True
+        try:
+            self.loop.call_soon_threadsafe(self._wake_all)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            self._wake_pending = False
+
+    def _count_drop(self, evicted: LogEntry):
+        # Called under the lock with the entry about to be overwritten
+        for subscriber in self.subscribers:
+            if subscriber.cursor < evicted[0] and self._matches(evicted, subscriber.min_level, subscriber.task_id):
+                subscriber.dropped += 1
+
+    def _wake_all(self):
+        with self._lock:
+            self._wake_pending = False
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.wake.set()
+
+    @staticmethod
+    def _format(entry: LogEntry) -> str:
+        return f"{entry[3].strftime('%H:%M:%S')} | {entry[4]} | {entry[5]}"
+
+    @staticmethod
+    def _matches(entry: LogEntry, min_level: int, task_id: Optional[str]) -> bool:
+        return entry[1] >= min_level and (task_id is None or entry[2] == task_id)
+
+    def _replay_cursor(self, replay: int, min_level: int, task_id: Optional[str]) -> int:
+        """Cursor positioned just before the last `replay` lines matching the filters."""
+        with self._lock:
+            cursor = self.seq
+            if replay <= 0:
+                return cursor
+            found = 0
+            for entry in reversed(self.buffer):
+                if self._matches(entry, min_level, task_id):
+                    cursor = entry[0] - 1
+                    found += 1
+                    if found >= replay:
+                        break
+            return cursor
+
+    def _read_after(self, subscriber: _Subscriber, limit: int = 256) -> Tuple[int, bool, List[LogEntry]]:
+        """
+        Returns `(dropped, gap, entries)`: how many matching lines were overwritten since the last read,
+        whether lines were missing before subscribing, then up to `limit` lines. Advances the cursor.
+        """
+        with self._lock:
+            dropped, gap = subscriber.dropped, subscriber.gap
+            subscriber.dropped, subscriber.gap = 0, False
+            if subscriber.cursor >= self.seq:
+                return dropped, gap, []
+            oldest = self.buffer[0][0]
+            # Sequence numbers are contiguous, so the cursor maps straight to a buffer position
+            start = max(subscriber.cursor + 1 - oldest, 0)
+            entries = [self.buffer[i] for i in range(start, min(start + limit, len(self.buffer)))]
+            subscriber.cursor = entries[-1][0]
+            return dropped, gap, entries
+
+    def _register(self, subscriber: _Subscriber):
+        with self._lock:
+            if self.buffer and subscriber.cursor < self.buffer[0][0] - 1:
+                missing = self.buffer[0][0] - 1 - subscriber.cursor
+                if subscriber.min_level == 0 and subscriber.task_id is None:
+                    subscriber.dropped = missing
+                else:
+                    subscriber.gap = True
+            self.subscribers.add(subscriber)
+
+    async def subscribe(self, replay: Optional[int] = None, level: Optional[str] = None,
+                        task_id: Optional[str] = None, last_seq: Optional[int] = None) -> AsyncGenerator[Tuple[int, str], None]:
+        """
+        Yields `(seq, line)` for lines at or above `level` (and of `task_id`, if given).
+        Starts after `last_seq` when resuming, otherwise with the last `replay` matching lines.
+        """
+        if self.loop is None:
+            self.bind_loop(asyncio.get_running_loop())
+        min_level = logger.level(level.upper()).no if level else 0
+        if last_seq is not None:
+            cursor = min(last_seq, self.seq)
+        else:
+            cursor = self._replay_cursor(self.replay_lines if replay is None else replay, min_level, task_id)
+
+        subscriber = _Subscriber(min_level, task_id, cursor)
+        self._register(subscriber)
         try:
             while True:
-                log_msg = await queue.get()
-                yield log_msg
+                subscriber.wake.clear()
+                while True:
+                    dropped, gap, entries = self._read_after(subscriber)
+                    # Markers take the id of the line before the next one delivered, so resuming skips the gap
+                    marker_seq = entries[0][0] - 1 if entries else subscriber.cursor
+                    if dropped:
+                        # Matching lines were overwritten before this subscriber read them
+                        if self.drop_policy == DISCONNECT:
+                            return
+                        yield marker_seq, f"... {dropped} messages dropped (client too slow)"
+                    elif gap:
+                        # Only on resume; disconnecting here would only make the client reconnect into the same gap
+                        yield marker_seq, "... earlier messages are no longer available"
+                    if not entries:
+                        break
+                    for entry in entries:
+                        if self._matches(entry, min_level, task_id):
+                            yield entry[0], self._format(entry)
+                await subscriber.wake.wait()
         finally:
-            self.queues.remove(queue)
-
-    def push_log(self, message: str):
-        for queue in self.queues:
-            queue.put_nowait(message)
+            with self._lock:
+                self.subscribers.discard(subscriber)
 
-log_streamer = LogStreamer()
+log_streamer = LogStreamer(
+    max_entries=settings.LOG_BUFFER_SIZE,
+    drop_policy=settings.LOG_DROP_POLICY,
+    replay_lines=settings.LOG_REPLAY_LINES,
+    idle_level=settings.LOG_IDLE_REPLAY_LEVEL,
+)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from git import Repo
+from loguru import logger
+from app.core.config import settings
+from app.services.workspace_reaper import workspace_reaper
+
+try:
+    import fcntl
+except ImportError:  # Windows: mirrors are only locked within the process
+    fcntl = None
+
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Holds an exclusive `flock` on `path`, shared by every process on the host. Yields whether the
+    lock was taken, which is only False when `blocking` is off and another holder has it.
+    """
+    if fcntl is None:
+        yield True
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)  # Also releases the lock
+
+
+class MirrorCache:
+    """
+    Keeps one bare mirror per remote URL so repeated analyses only pay for an incremental fetch.
+    Only the requested branches are fetched, and with `blobless` only commits and trees: clones
+    made from the mirror fetch the blobs they read from the real remote on demand.
+    Mirrors are evicted least-recently-used once their total size exceeds `max_bytes`.
+    Each mirror is guarded by a thread lock and a `<mirror>.lock` file lock, so threads, the process
+    pool and separate worker processes never fetch into or evict a mirror another one is using.
+    Size bookkeeping is per process.
+    """
+
+    def __init__(self, base_dir: str = "app/temp/mirrors", max_bytes: int = 5 * 1024 ** 3):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self._index_lock = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, least recently used first
+        if not os.path.exists(self.base_dir):
+            os.makedirs(self.base_dir)
+            logger.info(f"Created mirror cache directory: {self.base_dir}")
+        self._load_index()
+
+    @staticmethod
+    def cache_key(repo_url: str) -> str:
+        normalized = repo_url.strip().rstrip("/")
+        if normalized.endswith(".git"):
+            normalized = normalized[:-4]
+        return hashlib.sha256(normalized.lower().encode()).hexdigest()[:16]
+
+    def _mirror_path(self, key: str) -> str:
+        return os.path.join(self.base_dir, f"{key}.git")
+
+    def _lock_path(self, key: str) -> str:
+        # Kept after eviction: unlinking a lock file others may be waiting on would let two holders in
+        return os.path.join(self.base_dir, f"{key}.git.lock")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.base_dir):
+            path = os.path.join(self.base_dir, name)
+            if name.endswith(".git") and os.path.isdir(path):
+                entries.append((os.path.getmtime(path), name[:-4], self._pack_size(path)))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+
+    @staticmethod
+    def _pack_size(path: str) -> int:
+        # Fetches always keep their pack (fetch.unpackLimit=1), so the packs are the whole object store
+        pack_dir = os.path.join(path, "objects", "pack")
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(pack_dir) if entry.is_file())
+        except OSError:
+            return 0
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._index_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def acquire(self, repo_url: str, branch: str, fetch_url: Optional[str] = None, blobless: bool = True) -> Iterator[str]:
+        """
+        Creates or refreshes `branch` in the mirror for `repo_url` and yields its path.
+        The per-repo lock is held until the context exits, so callers can clone from it safely.
+        `fetch_url` may carry credentials; it is only used for the fetch and never stored.
+        """
+        key = self.cache_key(repo_url)
+        path = self._mirror_path(key)
+        try:
+            with self._lock_for(key), _file_lock(self._lock_path(key)):
+                self._refresh(path, repo_url, branch, fetch_url or repo_url, blobless)
+                os.utime(path)
+                with self._index_lock:
+                    self._sizes[key] = self._pack_size(path)
+                    self._sizes.move_to_end(key)
+                yield path
+        finally:
+            self._evict()
+
+    def _refresh(self, path: str, repo_url: str, branch: str, fetch_url: str, blobless: bool):
+        start = time.monotonic()
+        if os.path.exists(path):
+            repo = Repo(path)
+            action = "Updated"
+        else:
+            repo = Repo.init(path, bare=True)
+            action = "Created"
+        try:
+            with repo.config_writer() as config:
+                config.set_value('remote "origin"', "url", repo_url)
+                # Lets clones from the mirror ask for a blob filter of their own
+                config.set_value("uploadpack", "allowFilter", "true")
+                if blobless:
+                    config.set_value('remote "origin"', "promisor", "true")
+                    config.set_value('remote "origin"', "partialclonefilter", "blob:none")
+            # Credentials only ever appear on the command line, rewritten in from the stored URL
+            overrides = ["fetch.unpackLimit=1"]
+            if fetch_url != repo_url:
+                overrides.append(f"url.{fetch_url}.insteadOf={repo_url}")
+            fetch_options = {"filter": "blob:none"} if blobless else {}
+            repo.git(c=overrides).fetch("origin", f"+refs/heads/{branch}:refs/heads/{branch}", **fetch_options)
+        except Exception:
+            if action == "Created":
+                repo.close()
+                workspace_reaper.discard(path)
+            raise
+        finally:
+            repo.close()
+        logger.info(f"{action} mirror {path} ({branch}) in {time.monotonic() - start:.2f}s")
+
+    def _evict(self):
+        with self._index_lock:
+            total = sum(self._sizes.values())
+            for key in list(self._sizes):
+                if total <= self.max_bytes:
+                    break
+                lock = self._locks.get(key)
+                if lock is not None and not lock.acquire(blocking=False):
+                    continue  # In use, try the next least recently used mirror
+                try:
+                    with _file_lock(self._lock_path(key), blocking=False) as locked:
+                        if not locked:
+                            continue  # In use by another process
+                        workspace_reaper.discard(self._mirror_path(key))
+                        total -= self._sizes.pop(key)
+                        logger.info(f"Evicted mirror {key} (cache size now {total} bytes)")
+                finally:
+                    if lock is not None:
+                        lock.release()
+
+
+mirror_cache = MirrorCache(settings.MIRROR_CACHE_DIR, settings.MIRROR_CACHE_MAX_BYTES)
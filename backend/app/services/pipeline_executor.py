@@ -0,0 +1,55 @@
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+from app.core.config import settings
+
+
+class PipelineExecutor:
+    """
+    Runs the blocking clone/analyze/generate/push stages off the event loop.
+    Admission and concurrency of whole jobs are handled by the job queue and its workers.
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: int = 4):
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+            logger.info(f"Pipeline executor started ({self.mode}, {self.max_workers} workers).")
+        return self._executor
+
+    async def run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs a blocking callable in the pool. In process mode `func` must be picklable.
+        """
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            call = partial(func, *args, **kwargs)
+        else:
+            # Carry contextvars (e.g. loguru context) into the worker thread
+            call = partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await loop.run_in_executor(self.executor, call)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "max_workers": self.max_workers, "started": self._executor is not None}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pipeline_executor = PipelineExecutor(
+    mode=settings.PIPELINE_EXECUTOR,
+    max_workers=settings.PIPELINE_MAX_WORKERS,
+)
@@ -0,0 +1,135 @@
+import heapq
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.services.detectors import detector_engine
+from app.services.file_index import FileIndex
+
+# Files that describe how a project is built or run, beyond the detector manifests
+DEPLOYMENT_FILES = frozenset({
+    "Dockerfile", "docker-compose.yml", "docker-compose.yaml", "Procfile", "Makefile",
+    ".env.example", "app.yaml", "vercel.json", "netlify.toml", "nginx.conf",
+})
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class PromptContextBuilder:
+    """
+    Builds the repository context for AI refinement under a token budget.
+
+    Instead of the first N paths of the index it sends, in order of value: the findings so far,
+    the highest-signal paths (manifests, entry point candidates, deployment files, shallow paths
+    first), a directory summary with file counts and dominant extensions, and short excerpts of the
+    manifests. Each section is cut to whatever budget the previous ones left.
+    """
+
+    def __init__(self, token_budget: int = 1500, max_key_files: int = 40, max_dirs: int = 25, excerpt_chars: int = 600):
+        self.token_budget = token_budget
+        self.max_key_files = max_key_files
+        self.max_dirs = max_dirs
+        self.excerpt_chars = excerpt_chars
+        self.manifests = frozenset(detector_engine.manifest_names())
+        self.manifest_extensions = tuple(detector_engine.manifest_extensions())
+        self.entry_points = frozenset(detector_engine.entry_point_names())
+
+    @staticmethod
+    def _entries(file_index: Any) -> Iterable[Tuple[str, str]]:
+        if isinstance(file_index, FileIndex):
+            return file_index.entries()
+        paths = (file_index or {}).get("all_files", [])
+        return (tuple(path.rsplit("/", 1)) if "/" in path else ("", path) for path in paths)
+
+    def score(self, rel_dir: str, name: str) -> int:
+        """Higher is more informative; every directory level costs a little."""
+        depth = rel_dir.count("/") + 1 if rel_dir else 0
+        if name in self.manifests or name.endswith(self.manifest_extensions):
+            base = 100
+        elif name in DEPLOYMENT_FILES:
+            base = 80
+        elif name in self.entry_points:
+            base = 70
+        else:
+            base = 0
+        return base - 10 * depth
+
+    def rank_paths(self, file_index: Any) -> List[str]:
+        scored = ((-self.score(rel_dir, name), f"{rel_dir}/{name}" if rel_dir else name)
+                  for rel_dir, name in self._entries(file_index))
+        return [path for _, path in heapq.nsmallest(self.max_key_files, scored)]
+
+    def directory_summary(self, file_index: Any) -> List[str]:
+        """
+        One line per directory (up to two levels deep) with its recursive file count and top extensions,
+        largest directories first, so vendored or generated trees show up as a single count.
+        """
+        counts: Counter = Counter()
+        extensions: Dict[str, Counter] = {}
+        for rel_dir, name in self._entries(file_index):
+            parts = rel_dir.split("/") if rel_dir else []
+            ext = name[name.rfind("."):] if "." in name[1:] else name
+            for depth in range(1, min(len(parts), 2) + 1):
+                key = "/".join(parts[:depth])
+                counts[key] += 1
+                extensions.setdefault(key, Counter())[ext] += 1
+        lines = []
+        for directory, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:self.max_dirs]:
+            top = ", ".join(f"{ext} {n}" for ext, n in extensions[directory].most_common(3))
+            lines.append(f"{directory}/ ({count} files: {top})")
+        return lines
+
+    def _fit(self, lines: List[str], budget: int) -> List[str]:
+        kept = []
+        for line in lines:
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        return kept
+
+    def build(self, findings: Dict[str, Any], token_budget: Optional[int] = None) -> str:
+        file_index = findings.get("file_index")
+        budget = token_budget or self.token_budget
+        sections = []
+
+        current = [
+            f"Language: {findings.get('language')}",
+            f"Framework: {findings.get('framework')}",
+            f"Entry point: {findings.get('entry_point')}",
+            f"Architecture: {findings.get('architecture')}",
+        ]
+        for service in findings.get("services", [])[:10]:
+            current.append(f"Service {service['path']}: {service['language']} / {service['framework']}")
+        sections.append("Current Findings:\n" + "\n".join(current))
+        budget -= estimate_tokens(sections[-1])
+
+        key_files = self._fit(self.rank_paths(file_index), budget // 2)
+        if key_files:
+            sections.append("Key files:\n" + "\n".join(key_files))
+            budget -= estimate_tokens(sections[-1])
+
+        directories = self._fit(self.directory_summary(file_index), budget // 2)
+        if directories:
+            sections.append("Directories:\n" + "\n".join(directories))
+            budget -= estimate_tokens(sections[-1])
+
+        excerpts = []
+        for path, text in (findings.get("manifest_excerpts") or {}).items():
+            excerpt = f"--- {path} ---\n{text[:self.excerpt_chars]}"
+            if estimate_tokens(excerpt) > budget:
+                excerpt = excerpt[:(budget - 1) * 4]
+                if len(excerpt) < 80:
+                    break
+            excerpts.append(excerpt)
+            budget -= estimate_tokens(excerpt)
+        if excerpts:
+            sections.append("Manifest excerpts:\n" + "\n".join(excerpts))
+
+        return "\n\n".join(sections)
+
+
+prompt_context_builder = PromptContextBuilder(token_budget=settings.AI_PROMPT_TOKEN_BUDGET)
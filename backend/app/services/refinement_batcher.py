@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+from loguru import logger
+from app.core.config import settings
+from app.services.ai_service import ai_service
+
+
+class RefinementBatcher:
+    """
+    Groups refinement requests that arrive close together into one multi-project AI request.
+
+    The first request opens a window of `window_seconds`; everything that arrives before it
+    closes, up to `max_batch` entries, is refined by a single `ai_service.refine_batch` call.
+    A full batch is sent immediately. A lone request is refined on its own.
+    """
+
+    def __init__(self, max_batch: int = 8, window_seconds: float = 2.0):
+        self.max_batch = max(1, max_batch)
+        self.window_seconds = window_seconds
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def refine(self, findings: Dict[str, Any]) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((findings, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Callers that gave up while waiting no longer need a slot in the prompt
+        batch = [(findings, future) for findings, future in batch if not future.done()]
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            if len(batch) == 1:
+                results = [await ai_service.refine_analysis(batch[0][0])]
+            else:
+                results = await ai_service.refine_batch([findings for findings, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched refinement failed: {e}")
+            results = [findings for findings, _ in batch]
+        for (_, future), refined in zip(batch, results):
+            if not future.done():
+                future.set_result(refined)
+
+
+refinement_batcher = RefinementBatcher(
+    max_batch=settings.BATCH_REFINE_MAX_REPOS,
+    window_seconds=settings.BATCH_REFINE_WINDOW_SECONDS,
+)
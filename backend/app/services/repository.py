@@ -1,9 +1,33 @@
 import os
-import shutil
-import stat
-from git import Repo
+import re
+import tempfile
+from pathlib import Path
+from git import Git, Repo
 from loguru import logger
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.services.mirror_cache import mirror_cache
+from app.services.workspace_reaper import workspace_reaper
+from app.services.detectors import detector_engine
+
+# Clone strategies, cheapest last
+CLONE_FULL = "full"          # Complete history and blobs
+CLONE_BLOBLESS = "blobless"  # Complete history, blobs fetched on demand
+CLONE_SHALLOW = "shallow"    # Depth-1, single branch, full working tree
+CLONE_SPARSE = "sparse"      # Depth-1, blobless, working tree limited to manifests
+CLONE_TREE = "tree"          # Depth-1, blobless, no working tree until ensure_checkout()
+CLONE_STRATEGIES = (CLONE_FULL, CLONE_BLOBLESS, CLONE_SHALLOW, CLONE_SPARSE, CLONE_TREE)
+
+# Message of the commits pushed by push_changes; webhooks skip pushes made only of these
+GENERATED_COMMIT_MESSAGE = "Add generated deployment files"
+
+# Paths checked out by the sparse strategy: every file or extension a detector rule looks at,
+# plus the files FileGenerator writes so they can still be committed and pushed.
+SPARSE_CHECKOUT_PATTERNS: List[str] = (
+    detector_engine.watched_files()
+    + [f"*{ext}" for ext in detector_engine.watched_extensions()]
+    + ["Dockerfile", ".dockerignore", ".gitignore", "docker-compose.yml"]
+)
 
 class RepositoryService:
     def __init__(self, base_temp_dir: str = "app/temp/workspaces"):
@@ -12,67 +36,125 @@ class RepositoryService:
             os.makedirs(self.base_temp_dir)
             logger.info(f"Created base temporary directory: {self.base_temp_dir}")
 
-    def _rmtree(self, path: str, retries: int = 5):
+    def select_strategy(self) -> str:
         """
-        Internal helper to handle read-only files on Windows during deletion.
+        Picks the cheapest clone strategy that still supports a later push.
+        Analysis reads git objects directly, so the working tree is only materialized
+        by `ensure_checkout` when files are actually generated and pushed.
         """
-        import time
-        import gc
-        def on_rm_error(func, path, exc_info):
-            os.chmod(path, stat.S_IWRITE)
-            try:
-                func(path)
-            except Exception as e:
-                logger.debug(f"on_rm_error failed for {path}: {e}")
+        configured = settings.CLONE_STRATEGY
+        if configured in CLONE_STRATEGIES:
+            return configured
+        return CLONE_TREE
 
-        if os.path.exists(path):
-            # Force garbage collection to release any dangling file handles
-            gc.collect()
-            
-            for i in range(retries):
-                try:
-                    # onerror is for compatibility, onexc is 3.12+
-                    shutil.rmtree(path, onerror=on_rm_error)
-                    return
-                except Exception as e:
-                    if i < retries - 1:
-                        # On Windows, sometimes handles are released slowly
-                        logger.warning(f"Retry {i+1} deleting {path} due to error: {e}")
-                        time.sleep(0.5 * (i + 1)) # Increasing backoff
-                        gc.collect()
-                    else:
-                        logger.error(f"Failed to delete {path} after {retries} attempts: {e}")
-
-    def clone_repository(self, repo_url: str, branch: str = "main", token: Optional[str] = None) -> Optional[str]:
+    @staticmethod
+    def _is_blobless(strategy: str) -> bool:
+        return strategy in (CLONE_BLOBLESS, CLONE_SPARSE, CLONE_TREE)
+
+    def _clone_options(self, strategy: str, branch: str, local: bool = False) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"branch": branch}
+        if strategy in (CLONE_SHALLOW, CLONE_SPARSE, CLONE_TREE):
+            options["single_branch"] = True
+            # Mirror history is commits and trees read from local disk; it lets incremental analysis diff against the last run
+            if not local or not settings.INCREMENTAL_ANALYSIS:
+                options["depth"] = 1
+        if self._is_blobless(strategy):
+            options["filter"] = "blob:none"
+        # The mirror has no blobs to check out; they come from the real remote once origin points there
+        if strategy in (CLONE_SPARSE, CLONE_TREE) or (local and self._is_blobless(strategy)):
+            options["no_checkout"] = True
+        return options
+
+    def clone_repository(self, repo_url: str, branch: str = "main", token: Optional[str] = None,
+                         strategy: Optional[str] = None) -> Optional[str]:
         """
-        Clones a GitHub repository to a temporary workspace.
+        Clones a GitHub repository to a fresh temporary workspace.
+        Every call gets its own directory, so concurrent clones of the same repository never collide.
+        If no strategy is given, the configured (or cheapest) one is used.
         """
-        repo_name = repo_url.split("/")[-1].replace(".git", "")
-        target_dir = os.path.join(self.base_temp_dir, repo_name)
-
-        if os.path.exists(target_dir):
-            logger.info(f"Directory {target_dir} already exists. Cleaning up...")
-            self._rmtree(target_dir)
+        strategy = strategy or self.select_strategy()
+        repo_name = re.sub(r"[^A-Za-z0-9._-]+", "-", repo_url.rstrip("/").split("/")[-1].replace(".git", "")) or "repo"
+        target_dir = tempfile.mkdtemp(prefix=f"{repo_name}-", dir=self.base_temp_dir)
 
         try:
             # Inject token if provided
-            clone_url = repo_url
+            clone_url = self._auth_url(repo_url, token)
             if token:
-                if "https://" in repo_url:
-                    clone_url = repo_url.replace("https://", f"https://{token}@")
                 logger.info(f"Cloning {repo_url} with authentication...")
             else:
                 logger.info(f"Cloning {repo_url} (branch: {branch}) into {target_dir}...")
 
-            repo = Repo.clone_from(clone_url, target_dir, branch=branch)
-            repo.close()  # Close the handle immediately after cloning
-            logger.info(f"Successfully cloned {repo_url}")
+            if settings.MIRROR_CACHE_ENABLED:
+                with mirror_cache.acquire(repo_url, branch, fetch_url=clone_url, blobless=self._is_blobless(strategy)) as mirror_path:
+                    # A file:// URL, since plain local paths ignore depth and filters
+                    mirror_url = Path(mirror_path).resolve().as_uri()
+                    repo = Repo.clone_from(mirror_url, target_dir, **self._clone_options(strategy, branch, local=True))
+            else:
+                repo = Repo.clone_from(clone_url, target_dir, **self._clone_options(strategy, branch))
+            try:
+                if settings.MIRROR_CACHE_ENABLED:
+                    # Point the workspace at the real remote so push_changes still works
+                    repo.remote(name="origin").set_url(clone_url)
+                    if strategy == CLONE_BLOBLESS:
+                        repo.git.checkout(branch)
+                if strategy == CLONE_SPARSE:
+                    repo.git.sparse_checkout("set", "--no-cone", *SPARSE_CHECKOUT_PATTERNS)
+                    repo.git.checkout(branch)
+            finally:
+                repo.close()  # Close the handle immediately after cloning
+            logger.info(f"Successfully cloned {repo_url} ({strategy} clone)")
             return target_dir
         except Exception as e:
             logger.error(f"Failed to clone repository {repo_url}: {e}")
+            workspace_reaper.discard(target_dir)
+            return None
+
+    def ensure_checkout(self, workspace_path: str, branch: str = "main"):
+        """
+        Materializes the working tree of a clone made without checkout. No-op if it is already checked out.
+        """
+        if os.path.exists(os.path.join(workspace_path, ".git", "index")):
+            return
+        repo = Repo(workspace_path)
+        try:
+            repo.git.checkout(branch)
+            logger.info(f"Checked out working tree for {workspace_path}")
+        finally:
+            repo.close()
+
+    def _auth_url(self, repo_url: str, token: Optional[str] = None) -> str:
+        if token and "https://" in repo_url:
+            return repo_url.replace("https://", f"https://{token}@")
+        return repo_url
+
+    def resolve_head_sha(self, repo_url: str, branch: str = "main", token: Optional[str] = None) -> Optional[str]:
+        """
+        Resolves the commit SHA at the tip of `branch` with `git ls-remote`, without cloning.
+        """
+        try:
+            output = Git().ls_remote(self._auth_url(repo_url, token), f"refs/heads/{branch}")
+            if output:
+                return output.split()[0]
+            logger.warning(f"Branch {branch} not found on {repo_url}")
+        except Exception as e:
+            logger.warning(f"Could not resolve head of {repo_url}@{branch}: {e}")
+        return None
+
+    def get_head_sha(self, workspace_path: str) -> Optional[str]:
+        """
+        Returns the commit SHA checked out in a workspace.
+        """
+        try:
+            repo = Repo(workspace_path)
+            try:
+                return repo.head.commit.hexsha
+            finally:
+                repo.close()
+        except Exception as e:
+            logger.warning(f"Could not read HEAD of {workspace_path}: {e}")
             return None
 
-    def push_changes(self, workspace_path: str, commit_message: str = "Add generated deployment files"):
+    def push_changes(self, workspace_path: str, commit_message: str = GENERATED_COMMIT_MESSAGE):
         """
         Commits and pushes changes in the workspace back to the remote.
         """
@@ -102,9 +184,9 @@ class RepositoryService:
 
     def cleanup_workspace(self, workspace_path: str):
         """
-        Deletes the temporary workspace.
+        Discards the temporary workspace. It is only renamed here; the reaper deletes it in the background.
         """
         logger.info(f"Cleaning up workspace: {workspace_path}")
-        self._rmtree(workspace_path)
+        workspace_reaper.discard(workspace_path)
 
 repo_service = RepositoryService()
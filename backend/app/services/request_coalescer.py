@@ -0,0 +1,111 @@
+import datetime
+import hashlib
+from typing import Dict, Optional
+from loguru import logger
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.db.mongodb import db
+from app.services.task_manager import task_manager, TERMINAL_STATUSES
+
+
+class RequestCoalescer:
+    """
+    Single-flight registry of in-flight analyses keyed by (repo URL, branch, token).
+
+    The first request for a key becomes the leader and runs the job; identical requests arriving
+    while it runs attach to the leader's task instead of cloning again. With the shared job queue
+    the registry lives in MongoDB so API replicas coalesce with each other; otherwise it is a
+    process-local dict. A leader that finished or vanished without releasing its key is taken over.
+    """
+
+    collection_name = "inflight_analyses"
+
+    def __init__(self, shared: bool = False, ttl_seconds: int = 3600):
+        self.shared = shared
+        self.ttl_seconds = ttl_seconds
+        self._local: Dict[str, str] = {}
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise RuntimeError("MongoDB is not connected")
+        return db.db[self.collection_name]
+
+    async def setup(self):
+        if self.shared:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    @staticmethod
+    def make_key(repo_url: str, branch: str, token: Optional[str] = None) -> str:
+        normalized = repo_url.strip().rstrip("/").lower()
+        if normalized.endswith(".git"):
+            normalized = normalized[:-4]
+        # Runs that push with different credentials are different work
+        token_hash = hashlib.sha256(token.encode()).hexdigest()[:16] if token else ""
+        return hashlib.sha256(f"{normalized}|{branch}|{token_hash}".encode()).hexdigest()
+
+    async def _is_live(self, task_id: str) -> bool:
+        task = await task_manager.get_task(task_id)
+        return task is not None and task.get("status") not in TERMINAL_STATUSES
+
+    async def claim(self, key: str, task_id: str) -> Optional[str]:
+        """
+        Registers `task_id` as the leader for `key`. Returns the existing leader's task id
+        if one is still in flight (the caller should attach to it), or None if `task_id` leads.
+        """
+        leader = await self._current(key)
+        if leader and await self._is_live(leader):
+            return leader
+        # No leader, or a stale one: take over
+        if await self._replace(key, leader, task_id):
+            return None
+        # Lost a race with another request; whoever won leads
+        winner = await self._current(key)
+        return winner if winner and winner != task_id else None
+
+    async def leader(self, key: str) -> Optional[str]:
+        """The task id still in flight for `key`, if any. Registers nothing."""
+        leader = await self._current(key)
+        return leader if leader and await self._is_live(leader) else None
+
+    async def _current(self, key: str) -> Optional[str]:
+        if not self.shared:
+            return self._local.get(key)
+        doc = await self.collection.find_one({"_id": key}, {"task_id": 1})
+        return doc["task_id"] if doc else None
+
+    async def _replace(self, key: str, expected: Optional[str], task_id: str) -> bool:
+        if not self.shared:
+            if self._local.get(key) != expected:
+                return False
+            self._local[key] = task_id
+            return True
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.ttl_seconds)
+        if expected is None:
+            try:
+                await self.collection.insert_one({"_id": key, "task_id": task_id, "expires_at": expires_at})
+                return True
+            except DuplicateKeyError:
+                return False
+        result = await self.collection.update_one(
+            {"_id": key, "task_id": expected},
+            {"$set": {"task_id": task_id, "expires_at": expires_at}},
+        )
+        return result.modified_count == 1
+
+    async def release(self, key: str, task_id: str):
+        """Drops the key if `task_id` still leads it."""
+        try:
+            if not self.shared:
+                if self._local.get(key) == task_id:
+                    del self._local[key]
+            else:
+                await self.collection.delete_one({"_id": key, "task_id": task_id})
+        except Exception as e:
+            logger.warning(f"Could not release in-flight key for task {task_id}: {e}")
+
+
+request_coalescer = RequestCoalescer(
+    shared=settings.JOB_QUEUE == "mongo",
+    ttl_seconds=settings.JOB_LEASE_SECONDS * settings.JOB_MAX_ATTEMPTS * 2,
+)
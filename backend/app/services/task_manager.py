@@ -1,69 +1,260 @@
-from typing import Dict, Any, Optional
-import datetime
+from typing import AsyncIterator, Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import time
+from collections import Counter
 from loguru import logger
+from app.core.config import settings
+from app.services.task_store import TaskStore, InMemoryTaskStore, MongoTaskStore
+from app.services.task_record import (
+    STEP_DEFINITIONS, STEP_INDEX, STEP_STATUS_NAMES, STEP_PENDING, STEP_ACTIVE, STEP_COMPLETED, TaskRecord,
+)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Events retained per task for `Last-Event-ID` resumption; older gaps are bridged with a snapshot
+MAX_EVENTS_PER_TASK = 200
+
+# status -> (message, step transitions); a None message is derived from the caller's message
+STATUS_TRANSITIONS: Dict[str, Tuple[Optional[str], Tuple[Tuple[int, int], ...]]] = {
+    "queued": (None, ()),
+    "cloning": ("Cloning repository...", ((STEP_INDEX["analyze"], STEP_ACTIVE),)),
+    "analyzing": ("Analyzing project structure...", ((STEP_INDEX["analyze"], STEP_ACTIVE),)),
+    # Analysis is essentially done when we start generating
+    "generating": ("Generating deployment files...", ((STEP_INDEX["analyze"], STEP_ACTIVE),)),
+    "pushing": ("Pushing changes to GitHub...", ((STEP_INDEX["analyze"], STEP_ACTIVE),)),
+    # Build and Deploy stay pending until we implement those phases
+    "completed": ("Analysis and generation complete.", (
+        (STEP_INDEX["analyze"], STEP_COMPLETED),
+        (STEP_INDEX["build"], STEP_PENDING),
+        (STEP_INDEX["deploy"], STEP_PENDING),
+        (STEP_INDEX["monitor"], STEP_PENDING),
+    )),
+    "failed": (None, ()),
+}
+
+def create_task_store() -> TaskStore:
+    if settings.TASK_STORE == "mongo":
+        return MongoTaskStore(ttl_seconds=settings.TASK_TTL_SECONDS)
+    return InMemoryTaskStore(ttl_seconds=settings.TASK_TTL_SECONDS, max_entries=settings.TASK_MAX_ENTRIES)
 
 class TaskManager:
-    def __init__(self):
-        # In-memory store for now. In production, use Redis or Database.
-        self.tasks: Dict[str, Any] = {}
+    def __init__(self, store: Optional[TaskStore] = None):
+        self.store = store or create_task_store()
+        # Per-task event log: (seq, event, data), plus the wake-up flags of live subscribers
+        self._events: Dict[str, List[tuple]] = {}  # Plain lists: most tasks only ever log a handful of events
+        self._seq: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[asyncio.Event]] = {}
 
-    def update_task(self, task_id: str, status: str, message: str = ""):
+    async def update_task(self, task_id: str, status: str, message: str = ""):
         """
         Updates the status of a specific task.
-        Status options: 'cloning', 'analyzing', 'generating', 'pushing', 'completed', 'failed'
+        Status options: 'queued', 'cloning', 'analyzing', 'generating', 'pushing', 'completed', 'failed'
+        Only the fields that changed are written to the store.
         """
-        if task_id not in self.tasks:
-            self.tasks[task_id] = {
-                "id": task_id,
-                "created_at": datetime.datetime.now().isoformat(),
-                "steps": [
-                    {"id": "upload", "title": "Code Uploaded", "description": "Project files successfully uploaded to the platform", "status": "completed", "timestamp": "Just now"},
-                    {"id": "analyze", "title": "AI Analysis", "description": "Analyzing project structure and dependencies", "status": "pending"},
-                    {"id": "build", "title": "Build Process", "description": "Building application for deployment", "status": "pending"},
-                    {"id": "deploy", "title": "Deployment", "description": "Deploying to production environment", "status": "pending"},
-                    {"id": "monitor", "title": "Monitoring", "description": "Setting up monitoring and alerts", "status": "pending"},
-                ],
-                "current_message": "Task initialized",
-            }
-        
-        task = self.tasks[task_id]
-        
-        if status == "cloning":
-            self._update_step(task, "analyze", "active")
-            task["current_message"] = "Cloning repository..."
-        elif status == "analyzing":
-            self._update_step(task, "analyze", "active")
-            task["current_message"] = "Analyzing project structure..."
-        elif status == "generating":
-            # Analysis is essentially done when we start generating
-            self._update_step(task, "analyze", "active")
-            task["current_message"] = "Generating deployment files..."
-        elif status == "pushing":
-            self._update_step(task, "analyze", "active")
-            task["current_message"] = "Pushing changes to GitHub..."
-        elif status == "completed":
-            self._update_step(task, "analyze", "completed")
-            # Build and Deploy stay pending until we implement those phases
-            self._update_step(task, "build", "pending")
-            self._update_step(task, "deploy", "pending")
-            self._update_step(task, "monitor", "pending")
-            task["current_message"] = "Analysis and generation complete."
+        record = await self.store.get(task_id)
+        if record is None:
+            record = TaskRecord(task_id)
+            await self.store.create(record)
+
+        fixed_message, transitions = STATUS_TRANSITIONS.get(status, (None, ()))
+        if fixed_message is not None:
+            current_message = fixed_message
+        elif status == "queued":
+            current_message = message or "Waiting for a free worker..."
         elif status == "failed":
-            task["current_message"] = f"Error: {message}"
-            # Mark active steps as pending or error if needed
-            
-        task["updated_at"] = datetime.datetime.now().isoformat()
+            current_message = f"Error: {message}"
+        else:
+            current_message = record.message
+        previous_progress = (record.status, record.message)
+
+        fields: Dict[str, Any] = {"status": status, "message": current_message, "updated_at": time.time()}
+        changed_steps = [(index, state) for index, state in transitions if record.steps[index] != state]
+        for index, state in changed_steps:
+            fields[f"steps.{index}"] = state
+        await self.store.set_fields(task_id, fields)
         logger.debug(f"Task {task_id} updated to {status}")
 
-    def _update_step(self, task: dict, step_id: str, status: str):
-        for step in task["steps"]:
-            if step["id"] == step_id:
-                step["status"] = status
-                if status == "completed":
-                    step["timestamp"] = "Just now"
-                break
+        # Publish only what changed
+        for index, state in changed_steps:
+            self._publish(task_id, "step", {
+                "id": STEP_DEFINITIONS[index].id,
+                "status": STEP_STATUS_NAMES[state],
+                "timestamp": "Just now" if state == STEP_COMPLETED else None,
+            })
+        if status in TERMINAL_STATUSES:
+            self._publish(task_id, status, {"status": status, "message": current_message})
+        elif (status, current_message) != previous_progress:
+            self._publish(task_id, "progress", {"status": status, "message": current_message})
+
+    async def set_result(self, task_id: str, findings: Dict[str, Any]):
+        """
+        Attaches the (summarized) analysis findings to a task.
+        """
+        await self.store.set_fields(task_id, {"findings": findings})
+        self._publish(task_id, "result", findings)
+
+    async def attach(self, task_id: str, leader_id: str):
+        """
+        Creates `task_id` as a follower of an identical in-flight task; it reports the leader's progress.
+        """
+        record = TaskRecord(task_id)
+        record.leader_id = leader_id
+        await self.store.create(record)
+        logger.info(f"Task {task_id} coalesced onto in-flight task {leader_id}")
+
+    async def create_batch(self, batch_id: str, members: List[Dict[str, Any]]):
+        """
+        Creates a batch task and its queued member tasks. The batch's findings list the members
+        (`task_id`, `repo_url`, `branch`), so any process can aggregate their progress.
+        """
+        batch = TaskRecord(batch_id)
+        batch.status = "queued"
+        batch.message = f"Waiting to analyze {len(members)} repositories..."
+        batch.findings = {"tasks": members}
+        await self.store.create(batch)
+        for member in members:
+            record = TaskRecord(member["task_id"])
+            record.status = "queued"
+            record.message = f"Waiting in batch {batch_id}..."
+            await self.store.create(record)
+
+    async def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Aggregates the progress of a batch's member tasks, reading them in one store round-trip."""
+        batch = await self.store.get(batch_id)
+        if batch is None or not batch.findings or "tasks" not in batch.findings:
+            return None
+        members = batch.findings["tasks"]
+        records = await self.store.get_many([m["task_id"] for m in members])
+        leaders = await self.store.get_many(list({r.leader_id for r in records.values() if r.leader_id}))
+
+        counts: Counter = Counter()
+        tasks = []
+        for member in members:
+            record = records.get(member["task_id"])
+            if record is not None and record.leader_id:
+                record = leaders.get(record.leader_id, record)
+            status = record.status if record else "expired"
+            findings = (record.findings if record else None) or {}
+            counts[status] += 1
+            tasks.append({
+                **member,
+                "status": status,
+                "message": record.message if record else "Task state expired",
+                "language": findings.get("language"),
+                "framework": findings.get("framework"),
+                "confidence": findings.get("confidence"),
+                "ai_refined": findings.get("ai_refined", False),
+            })
+
+        finished = sum(counts[s] for s in TERMINAL_STATUSES) + counts["expired"]
+        return {
+            "id": batch_id,
+            "status": batch.status,
+            "current_message": batch.message,
+            "total": len(members),
+            "finished": finished,
+            "progress": round(100 * finished / len(members)) if members else 100,
+            "counts": dict(counts),
+            "tasks": tasks,
+        }
+
+    async def resolve(self, task_id: str) -> str:
+        """The id of the task that actually carries `task_id`'s progress."""
+        record = await self.store.get(task_id)
+        return record.leader_id if record and record.leader_id else task_id
+
+    async def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Renders the task in its JSON shape. Followers render their leader's state under their own id."""
+        record = await self.store.get(task_id)
+        if record is None or record.leader_id is None:
+            return record.render() if record else None
+        leader = await self.store.get(record.leader_id)
+        if leader is None:
+            return record.render()
+        return {**leader.render(), "id": task_id, "coalesced_with": record.leader_id}
+
+    def _publish(self, task_id: str, event: str, data: Any):
+        seq = self._seq.get(task_id, 0) + 1
+        self._seq[task_id] = seq
+        events = self._events.setdefault(task_id, [])
+        events.append((seq, event, data))
+        if len(events) > MAX_EVENTS_PER_TASK:
+            del events[:len(events) - MAX_EVENTS_PER_TASK]
+        if event in TERMINAL_STATUSES:
+            # Nothing follows a terminal event; the log can go once no stream still needs it
+            asyncio.get_running_loop().call_later(settings.TASK_EVENTS_GRACE_SECONDS, self._forget, task_id)
+        for wake in self._subscribers.get(task_id, ()):
+            wake.set()
+
+    def _forget(self, task_id: str):
+        if task_id not in self._subscribers:
+            self._events.pop(task_id, None)
+            self._seq.pop(task_id, None)
+
+    def _events_after(self, task_id: str, last_id: int) -> Optional[List[tuple]]:
+        """
+        Events newer than `last_id`, or None if this process cannot replay them
+        (never published here, or already evicted).
+        """
+        events = self._events.get(task_id)
+        if not events or not last_id:
+            return None
+        if events[-1][0] <= last_id:
+            return []
+        if events[0][0] > last_id + 1:
+            return None
+        return [e for e in events if e[0] > last_id]
+
+    async def subscribe(self, task_id: str, last_event_id: int = 0) -> AsyncIterator[tuple]:
+        """
+        Yields `(seq, event, data)` for a task, starting after `last_event_id`, until the task
+        reaches a terminal status. A fresh subscriber first receives a snapshot of the task, as does
+        one whose missed events were already evicted. Tasks running in another process are followed
+        by polling the store and sending a snapshot whenever they change.
+        """
+        leader_id = await self.resolve(task_id)
+        if leader_id != task_id:
+            async for seq, event, data in self.subscribe(leader_id, last_event_id):
+                if event == "snapshot":
+                    data = {**data, "id": task_id, "coalesced_with": leader_id}
+                yield (seq, event, data)
+            return
 
-    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
-        return self.tasks.get(task_id)
+        wake = asyncio.Event()
+        self._subscribers.setdefault(task_id, set()).add(wake)
+        try:
+            last_id = last_event_id
+            last_seen = None
+            while True:
+                wake.clear()
+                events = self._events_after(task_id, last_id)
+                if events is None:
+                    task = await self.get_task(task_id)
+                    if task is None:
+                        return
+                    if task.get("updated_at") != last_seen:
+                        last_seen = task.get("updated_at")
+                        last_id = self._seq.get(task_id) or last_id + 1
+                        events = [(last_id, "snapshot", task)]
+                    else:
+                        events = []
+                for seq, event, data in events:
+                    last_id = seq
+                    yield (seq, event, data)
+                    if event in TERMINAL_STATUSES or (event == "snapshot" and data.get("status") in TERMINAL_STATUSES):
+                        return
+                if task_id in self._seq:
+                    await wake.wait()
+                else:
+                    try:
+                        await asyncio.wait_for(wake.wait(), settings.TASK_EVENTS_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(wake)
+                if not subscribers:
+                    del self._subscribers[task_id]
 
 task_manager = TaskManager()
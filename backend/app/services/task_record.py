@@ -0,0 +1,95 @@
+import datetime
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+# Step states are stored as small ints and named only when rendered
+STEP_PENDING, STEP_ACTIVE, STEP_COMPLETED = 0, 1, 2
+STEP_STATUS_NAMES = ("pending", "active", "completed")
+
+
+class StepDefinition(NamedTuple):
+    id: str
+    title: str
+    description: str
+    initial: int = STEP_PENDING
+
+
+# Static step metadata, shared by every task
+STEP_DEFINITIONS: Tuple[StepDefinition, ...] = (
+    StepDefinition("upload", "Code Uploaded", "Project files successfully uploaded to the platform", STEP_COMPLETED),
+    StepDefinition("analyze", "AI Analysis", "Analyzing project structure and dependencies"),
+    StepDefinition("build", "Build Process", "Building application for deployment"),
+    StepDefinition("deploy", "Deployment", "Deploying to production environment"),
+    StepDefinition("monitor", "Monitoring", "Setting up monitoring and alerts"),
+)
+STEP_INDEX: Dict[str, int] = {step.id: i for i, step in enumerate(STEP_DEFINITIONS)}
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp).isoformat()
+
+
+class TaskRecord:
+    """
+    Compact per-task state: step states in a bytearray, epoch-second floats for times, and
+    references to the shared step metadata. `render()` produces the JSON shape served by `/status`.
+    """
+
+    __slots__ = ("id", "created_at", "updated_at", "status", "message", "steps", "findings", "leader_id")
+
+    def __init__(self, task_id: str):
+        self.id = task_id
+        self.created_at = self.updated_at = time.time()
+        self.status: Optional[str] = None
+        self.message = "Task initialized"
+        self.steps = bytearray(step.initial for step in STEP_DEFINITIONS)
+        self.findings: Optional[Dict[str, Any]] = None
+        self.leader_id: Optional[str] = None  # Set when the task is coalesced onto another one
+
+    def render_step(self, index: int) -> Dict[str, Any]:
+        definition = STEP_DEFINITIONS[index]
+        step = {
+            "id": definition.id,
+            "title": definition.title,
+            "description": definition.description,
+            "status": STEP_STATUS_NAMES[self.steps[index]],
+        }
+        if self.steps[index] == STEP_COMPLETED:
+            step["timestamp"] = "Just now"
+        return step
+
+    def render(self) -> Dict[str, Any]:
+        task = {
+            "id": self.id,
+            "created_at": _iso(self.created_at),
+            "steps": [self.render_step(i) for i in range(len(self.steps))],
+            "current_message": self.message,
+            "status": self.status,
+            "updated_at": _iso(self.updated_at),
+        }
+        if self.findings is not None:
+            task["findings"] = self.findings
+        return task
+
+    def to_doc(self) -> Dict[str, Any]:
+        return {
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "status": self.status,
+            "message": self.message,
+            "steps": list(self.steps),
+            "findings": self.findings,
+            "leader_id": self.leader_id,
+        }
+
+    @classmethod
+    def from_doc(cls, task_id: str, doc: Dict[str, Any]) -> "TaskRecord":
+        record = cls(task_id)
+        record.created_at = doc.get("created_at", record.created_at)
+        record.updated_at = doc.get("updated_at", record.updated_at)
+        record.status = doc.get("status")
+        record.message = doc.get("message", record.message)
+        record.steps = bytearray(doc.get("steps", record.steps))
+        record.findings = doc.get("findings")
+        record.leader_id = doc.get("leader_id")
+        return record
@@ -0,0 +1,141 @@
+import datetime
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from loguru import logger
+from app.db.mongodb import db
+from app.services.task_record import TaskRecord
+
+
+class TaskStore(ABC):
+    """
+    Storage backend for `TaskRecord`s. Updates are expressed as `{field: value}` sets, where
+    `steps.<i>` addresses a single step state, so a backend can apply them atomically without
+    rewriting the whole record.
+    """
+
+    async def setup(self):
+        """Prepares the backend (indexes, connections). Called once at startup."""
+
+    @abstractmethod
+    async def create(self, record: TaskRecord) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        ...
+
+    async def get_many(self, task_ids: List[str]) -> Dict[str, TaskRecord]:
+        """The records that exist among `task_ids`, keyed by id."""
+        records = {}
+        for task_id in task_ids:
+            record = await self.get(task_id)
+            if record is not None:
+                records[task_id] = record
+        return records
+
+    @abstractmethod
+    async def set_fields(self, task_id: str, fields: Dict[str, Any]) -> None:
+        ...
+
+
+class InMemoryTaskStore(TaskStore):
+    """
+    Process-local store. Tasks expire `ttl_seconds` after their last update and the least
+    recently updated tasks are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, ttl_seconds: int = 86400, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._tasks: "OrderedDict[str, TaskRecord]" = OrderedDict()
+        self._expires: Dict[str, float] = {}
+
+    def _touch(self, task_id: str):
+        self._tasks.move_to_end(task_id)
+        self._expires[task_id] = time.monotonic() + self.ttl_seconds
+        self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest updates sit at the front, so expired tasks are always a prefix
+        while self._tasks:
+            task_id = next(iter(self._tasks))
+            if len(self._tasks) <= self.max_entries and self._expires[task_id] > now:
+                break
+            self._tasks.popitem(last=False)
+            del self._expires[task_id]
+
+    async def create(self, record: TaskRecord) -> None:
+        self._tasks[record.id] = record
+        self._touch(record.id)
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        record = self._tasks.get(task_id)
+        if record is not None and self._expires[task_id] <= time.monotonic():
+            self._evict()
+            return None
+        return record
+
+    async def set_fields(self, task_id: str, fields: Dict[str, Any]) -> None:
+        record = self._tasks.get(task_id)
+        if record is None:
+            return
+        for field, value in fields.items():
+            if field.startswith("steps."):
+                record.steps[int(field[6:])] = value
+            else:
+                setattr(record, field, value)
+        self._touch(task_id)
+
+
+class MongoTaskStore(TaskStore):
+    """
+    Stores tasks in MongoDB on the shared Motor client, so any API worker can serve any task
+    and in-flight state survives restarts. Each update is a single atomic `$set`; a TTL index
+    on `expires_at` removes tasks `ttl_seconds` after their last update.
+    """
+
+    collection_name = "tasks"
+
+    def __init__(self, ttl_seconds: int = 86400):
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise RuntimeError("MongoDB is not connected")
+        return db.db[self.collection_name]
+
+    def _expires_at(self) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.ttl_seconds)
+
+    async def setup(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        logger.info(f"Task store: MongoDB collection '{self.collection_name}' (TTL {self.ttl_seconds}s)")
+
+    async def create(self, record: TaskRecord) -> None:
+        await self.collection.replace_one(
+            {"_id": record.id},
+            {**record.to_doc(), "_id": record.id, "expires_at": self._expires_at()},
+            upsert=True,
+        )
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        doc = await self.collection.find_one({"_id": task_id}, {"_id": 0, "expires_at": 0})
+        return TaskRecord.from_doc(task_id, doc) if doc else None
+
+    async def get_many(self, task_ids: List[str]) -> Dict[str, TaskRecord]:
+        cursor = self.collection.find({"_id": {"$in": task_ids}}, {"expires_at": 0})
+        records = {}
+        async for doc in cursor:
+            task_id = doc.pop("_id")
+            records[task_id] = TaskRecord.from_doc(task_id, doc)
+        return records
+
+    async def set_fields(self, task_id: str, fields: Dict[str, Any]) -> None:
+        await self.collection.update_one(
+            {"_id": task_id},
+            {"$set": {**fields, "expires_at": self._expires_at()}},
+        )
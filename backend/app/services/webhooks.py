@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import hmac
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from loguru import logger
+from app.services.analysis import analysis_engine
+from app.services.repository import GENERATED_COMMIT_MESSAGE
+
+# GitHub lists at most this many commits in a push payload; longer pushes are truncated
+MAX_PAYLOAD_COMMITS = 20
+
+
+@dataclass
+class PushEvent:
+    repo_url: str
+    branch: str
+    after: str
+    changed_paths: List[str] = field(default_factory=list)
+    created: bool = False
+    forced: bool = False
+    complete: bool = True  # False when the payload does not list every commit
+    generated: bool = False  # Only commits pushed by this service
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Checks an `X-Hub-Signature-256` header (`sha256=<hex HMAC of the raw body>`) in constant time."""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+def parse_push_event(payload: Dict[str, Any]) -> Optional[PushEvent]:
+    """
+    Reads a GitHub `push` payload. Returns None for pushes that leave nothing to analyze:
+    tags and branch deletions.
+    """
+    ref = payload.get("ref") or ""
+    if not ref.startswith("refs/heads/") or payload.get("deleted"):
+        return None
+    repository = payload.get("repository") or {}
+    repo_url = repository.get("clone_url") or repository.get("html_url")
+    if not repo_url:
+        return None
+
+    commits = payload.get("commits") or []
+    paths = {
+        path
+        for commit in commits
+        for key in ("added", "modified", "removed")
+        for path in commit.get(key) or ()
+    }
+    return PushEvent(
+        repo_url=repo_url,
+        branch=ref[len("refs/heads/"):],
+        after=payload.get("after") or "",
+        changed_paths=sorted(paths),
+        created=bool(payload.get("created")),
+        forced=bool(payload.get("forced")),
+        complete=len(commits) < MAX_PAYLOAD_COMMITS,
+        generated=bool(commits) and all((c.get("message") or "").strip() == GENERATED_COMMIT_MESSAGE for c in commits),
+    )
+
+
+def is_relevant_push(push: PushEvent) -> bool:
+    """
+    Whether a push can change the findings. New branches, force pushes and truncated payloads
+    are assumed to; pushes of generated files only are not, so pushing them does not loop.
+    """
+    if push.generated:
+        return False
+    if push.created or push.forced or not push.complete:
+        return True
+    return any(analysis_engine.is_relevant_change(path) for path in push.changed_paths)
+
+
+@dataclass
+class _PendingPush:
+    push: PushEvent
+    first_at: float
+    count: int = 1
+    retries: int = 0
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class PushDebouncer:
+    """
+    Collapses bursts of pushes to the same branch into a single `fire(push)` with the latest push.
+    Every push restarts a quiet period of `delay` seconds, but a branch that keeps receiving pushes
+    still fires `max_delay` seconds after the first one. State is per process.
+
+    `fire` returns False when the push cannot be handled yet (the branch is still being analyzed,
+    the queue is full); it is then fired again after a doubling delay, at most `max_retries` times.
+    """
+
+    def __init__(self, fire: Callable[[PushEvent], Awaitable[Any]], delay: float = 10.0, max_delay: float = 60.0,
+                 max_retries: int = 5):
+        self.fire = fire
+        self.delay = delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._pending: Dict[Tuple[str, str], _PendingPush] = {}
+        self._running: Set[asyncio.Task] = set()
+
+    def schedule(self, push: PushEvent) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        key = (push.repo_url, push.branch)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = _PendingPush(push, first_at=loop.time())
+        else:
+            entry.timer.cancel()
+            entry.push = push
+            entry.count += 1
+        delay = max(0.0, min(self.delay, entry.first_at + self.max_delay - loop.time()))
+        entry.timer = loop.call_later(delay, self._fire, key)
+        return {"pushes": entry.count, "fires_in": round(delay, 3)}
+
+    def _fire(self, key: Tuple[str, str]):
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return
+        entry.timer.cancel()
+        task = asyncio.create_task(self._run(entry))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, entry: _PendingPush):
+        try:
+            logger.info(f"Analyzing {entry.push.repo_url}@{entry.push.branch} after {entry.count} push(es)")
+            if await self.fire(entry.push) is False:
+                self._defer(entry)
+        except Exception as e:
+            logger.error(f"Debounced analysis of {entry.push.repo_url}@{entry.push.branch} failed to start: {e}")
+
+    def _defer(self, entry: _PendingPush):
+        push = entry.push
+        key = (push.repo_url, push.branch)
+        if key in self._pending:
+            return  # A newer push is already waiting and covers this one
+        if entry.retries >= self.max_retries:
+            logger.warning(f"Giving up on analyzing {push.repo_url}@{push.branch} after {entry.retries} retries")
+            return
+        loop = asyncio.get_running_loop()
+        delay = self.delay * 2 ** entry.retries
+        retry = self._pending[key] = _PendingPush(push, first_at=loop.time(), count=entry.count, retries=entry.retries + 1)
+        retry.timer = loop.call_later(delay, self._fire, key)
+        logger.info(f"Checking {push.repo_url}@{push.branch} again in {delay:.1f}s (retry {retry.retries} of {self.max_retries})")
+
+    async def flush(self):
+        """Fires every pending branch now and waits for the submissions, e.g. at shutdown."""
+        for key in list(self._pending):
+            self._fire(key)
+        await asyncio.gather(*self._running, return_exceptions=True)
@@ -0,0 +1,123 @@
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+from loguru import logger
+from app.core.config import settings
+
+TRASH_DIR_NAME = ".trash"
+
+
+def _make_writable(func, path, exc_info):
+    # Read-only files (e.g. git objects on Windows) cannot be unlinked until made writable
+    os.chmod(path, stat.S_IWRITE)
+    try:
+        func(path)
+    except Exception as e:
+        logger.debug(f"Could not delete {path}: {e}")
+
+
+class WorkspaceReaper:
+    """
+    Deletes directories off the request path. `discard` atomically renames a directory into a
+    `.trash` folder next to it (same filesystem, so the rename is instant and the original path is
+    free at once) and a small thread pool deletes it. Failed deletions are retried on a timer rather
+    than by sleeping, and whatever is still in the trash is picked up by the next `sweep`.
+    """
+
+    def __init__(self, workspace_dir: str = "app/temp/workspaces", max_workers: int = 2, retries: int = 3):
+        self.workspace_dir = workspace_dir
+        self.retries = retries
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="workspace-reaper")
+        self._lock = threading.Lock()
+        self._stats = {"discarded": 0, "deleted": 0, "failed": 0, "pending": 0}
+
+    def discard(self, path: str):
+        """Moves `path` out of the way and schedules its deletion. Safe to call on missing paths."""
+        if not os.path.exists(path):
+            return
+        parent, name = os.path.split(os.path.normpath(path))
+        trash_dir = os.path.join(parent, TRASH_DIR_NAME)
+        target = os.path.join(trash_dir, f"{name}-{uuid.uuid4().hex[:8]}")
+        try:
+            os.makedirs(trash_dir, exist_ok=True)
+            os.rename(path, target)
+        except OSError as e:
+            # Still delete it in the background, just not atomically
+            logger.warning(f"Could not move {path} to the trash, deleting it in place: {e}")
+            target = path
+        with self._lock:
+            self._stats["discarded"] += 1
+        self._submit(target, attempt=1)
+
+    def _submit(self, path: str, attempt: int):
+        with self._lock:
+            self._stats["pending"] += 1
+        try:
+            self._pool.submit(self._delete, path, attempt)
+        except RuntimeError:
+            # Shutting down; the next sweep deletes it
+            with self._lock:
+                self._stats["pending"] -= 1
+
+    def _delete(self, path: str, attempt: int):
+        try:
+            if os.path.lexists(path):
+                shutil.rmtree(path, onerror=_make_writable)
+            if os.path.lexists(path):
+                raise OSError("some files could not be removed")
+            outcome = "deleted"
+        except Exception as e:
+            if attempt < self.retries:
+                # Handles (mostly on Windows) can take a moment to be released
+                logger.debug(f"Retrying deletion of {path} ({attempt}/{self.retries}): {e}")
+                timer = threading.Timer(0.5 * attempt, self._submit, (path, attempt + 1))
+                timer.daemon = True
+                timer.start()
+                outcome = None
+            else:
+                logger.error(f"Failed to delete {path} after {attempt} attempts: {e}")
+                outcome = "failed"
+        with self._lock:
+            self._stats["pending"] -= 1
+            if outcome:
+                self._stats[outcome] += 1
+
+    def sweep(self, orphan_age_seconds: float = 0):
+        """
+        Queues the deletion of leftovers from earlier processes: the trash, and workspaces not
+        modified for `orphan_age_seconds`, which no running task can still be using.
+        """
+        self.sweep_trash(self.workspace_dir)
+        if not os.path.isdir(self.workspace_dir):
+            return
+        cutoff = time.time() - orphan_age_seconds
+        orphans = 0
+        for entry in os.scandir(self.workspace_dir):
+            if entry.name != TRASH_DIR_NAME and entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime <= cutoff:
+                self.discard(entry.path)
+                orphans += 1
+        if orphans:
+            logger.info(f"Discarding {orphans} orphaned workspaces")
+
+    def sweep_trash(self, parent_dir: str):
+        """Queues the deletion of everything in the trash of `parent_dir`."""
+        trash_dir = os.path.join(parent_dir, TRASH_DIR_NAME)
+        if os.path.isdir(trash_dir):
+            for entry in os.scandir(trash_dir):
+                self._submit(entry.path, attempt=1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait: bool = False):
+        """Stops the pool. Unfinished deletions stay in the trash for the next sweep."""
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+workspace_reaper = WorkspaceReaper(max_workers=settings.WORKSPACE_REAPER_WORKERS)
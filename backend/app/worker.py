@@ -0,0 +1,175 @@
+import asyncio
+import os
+import signal
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.db.mongodb import db
+from app.background.pipeline import analyze_repo_task, analyze_batch_task, release_analysis
+from app.services.job_queue import Job, JobQueue, LocalJobQueue, job_queue
+from app.services.log_streamer import log_streamer
+from app.services.pipeline_executor import pipeline_executor
+from app.services.request_coalescer import request_coalescer
+from app.services.workspace_reaper import workspace_reaper
+from app.services.task_manager import task_manager
+from loguru import logger
+
+# Job kind -> coroutine called with the job id (also the task id) and the job payload
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[Any]]] = {
+    "analyze": analyze_repo_task,
+    "analyze_batch": analyze_batch_task,
+}
+
+# Job kind -> coroutine called like the handler once the job has completed or finally failed
+JOB_FINALIZERS: Dict[str, Callable[..., Awaitable[Any]]] = {
+    "analyze": release_analysis,
+}
+
+# How often an idle worker looks for jobs whose lease ran out on their last attempt
+REAP_INTERVAL_SECONDS = 30
+
+
+class Worker:
+    """
+    Claims jobs from a `JobQueue` and runs up to `concurrency` of them at once, renewing each
+    job's lease while it runs. Used both embedded in the API process and by `python -m app.worker`.
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int = 4, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._last_reap = 0.0
+        self._stopping = False
+
+    def start(self):
+        self._loop_task = asyncio.create_task(self.run())
+        logger.info(f"Worker {self.worker_id} started ({self.concurrency} concurrent jobs).")
+
+    async def stop(self):
+        """
+        Stops claiming and cancels running jobs; their leases lapse and another worker retries them.
+        """
+        self._stopping = True
+        if self._loop_task:
+            # The flag covers a cancellation swallowed by a wait that completed at the same time
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped.")
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while not self._stopping:
+            await slots.acquire()
+            try:
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id}: could not claim a job: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                await self._reap()
+                await self.queue.wait_for_work(settings.JOB_POLL_SECONDS)
+                continue
+            if self._stopping:
+                # Claimed during shutdown: hand it back by letting the lease lapse
+                slots.release()
+                break
+            task = asyncio.create_task(self._execute(job, slots))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job: Job, slots: asyncio.Semaphore):
+        logger.info(f"Worker {self.worker_id}: running {job.kind} job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+        handler = asyncio.create_task(JOB_HANDLERS[job.kind](job.id, **job.payload))
+        heartbeat = asyncio.create_task(self._heartbeat(job, handler))
+        try:
+            await handler
+            await self.queue.complete(job.id, self.worker_id)
+            await self._finalize(job)
+        except asyncio.CancelledError:
+            if self._stopping or not heartbeat.done():
+                raise
+            # Cancelled by the heartbeat: the job is another worker's now, so leave its task alone
+            logger.warning(f"Worker {self.worker_id}: abandoned job {job.id} after losing its lease")
+        except Exception as e:
+            logger.exception(f"Job {job.id} crashed: {e}")
+            if await self.queue.fail(job.id, self.worker_id, str(e)):
+                await task_manager.update_task(job.id, "queued", message=f"Retrying after an error (attempt {job.attempts} of {job.max_attempts} failed)...")
+            else:
+                await task_manager.update_task(job.id, "failed", message=str(e))
+                await self._finalize(job)
+        finally:
+            heartbeat.cancel()
+            slots.release()
+
+    async def _finalize(self, job: Job):
+        finalizer = JOB_FINALIZERS.get(job.kind)
+        if finalizer:
+            try:
+                await finalizer(job.id, **job.payload)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id}: could not finalize job {job.id}: {e}")
+
+    async def _heartbeat(self, job: Job, handler: asyncio.Task):
+        while True:
+            await asyncio.sleep(max(self.queue.lease_seconds / 3, 1))
+            if not await self.queue.heartbeat(job.id, self.worker_id):
+                # Another worker may have claimed the job already; two runs must not overlap
+                logger.warning(f"Worker {self.worker_id} lost the lease on job {job.id}, cancelling it")
+                handler.cancel()
+                return
+
+    async def _reap(self):
+        if time.monotonic() - self._last_reap < REAP_INTERVAL_SECONDS:
+            return
+        self._last_reap = time.monotonic()
+        try:
+            for job_id in await self.queue.reap_expired():
+                logger.warning(f"Job {job_id} exhausted its attempts after its lease expired.")
+                await task_manager.update_task(job_id, "failed", message="The worker running this task stopped responding.")
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: could not reap expired jobs: {e}")
+
+
+async def main():
+    """
+    Standalone worker: `python -m app.worker`. Needs `JOB_QUEUE=mongo` (and normally
+    `TASK_STORE=mongo`) so it shares jobs and task state with the API processes.
+    """
+    setup_logging()
+    log_streamer.bind_loop(asyncio.get_running_loop())
+    if isinstance(job_queue, LocalJobQueue):
+        logger.warning("JOB_QUEUE is 'local': this worker only sees jobs enqueued in its own process.")
+
+    await db.connect_to_mongo()
+    await task_manager.store.setup()
+    await job_queue.setup()
+    await request_coalescer.setup()
+    # Workspaces and mirrors left behind by crashed tasks or an earlier process
+    workspace_reaper.sweep(settings.WORKSPACE_ORPHAN_SECONDS)
+    workspace_reaper.sweep_trash(settings.MIRROR_CACHE_DIR)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker = Worker(job_queue, settings.WORKER_CONCURRENCY)
+    worker.start()
+    await stop.wait()
+    await worker.stop()
+    pipeline_executor.shutdown()
+    workspace_reaper.shutdown()
+    await db.close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
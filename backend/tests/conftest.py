@@ -0,0 +1,4 @@
+import os
+
+# Settings require a Mongo URI; these tests never connect
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from app.services import ai_service as ai_service_module
+from app.services.ai_cache import AIResponseCache
+from app.services.ai_providers.fake_provider import FakeProvider
+from app.services.ai_service import AIService
+from app.services.circuit_breaker import OPEN
+
+FINDINGS = {"language": "Python", "framework": "FastAPI", "entry_point": "main.py", "confidence": 0.5}
+
+
+class SlowProvider(FakeProvider):
+    """Answers only after its timeout has passed."""
+
+    def __init__(self):
+        super().__init__(latency=1.0, timeout=0.05)
+
+
+class FailingProvider(FakeProvider):
+    async def refine_analysis(self, findings):
+        self.calls += 1
+        raise RuntimeError("upstream error")
+
+    async def chat(self, message):
+        self.calls += 1
+        raise RuntimeError("upstream error")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = AIResponseCache()
+    monkeypatch.setattr(ai_service_module, "ai_cache", cache)
+    return cache
+
+
+def make_service(*providers) -> AIService:
+    service = AIService()
+    service.providers = list(providers)
+    service.breakers = {}
+    return service
+
+
+def test_second_identical_call_is_served_from_cache(fresh_cache):
+    provider = FakeProvider()
+    service = make_service(provider)
+
+    async def scenario():
+        first = await service.refine_analysis(dict(FINDINGS))
+        second = await service.refine_analysis(dict(FINDINGS))
+        chats = [await service.chat_with_agent("How do I deploy?") for _ in range(2)]
+        return first, second, chats
+
+    first, second, chats = asyncio.run(scenario())
+    assert provider.calls == 2  # One refinement, one chat
+    assert first == second and first["ai_refined"] and first["confidence"] == 0.75
+    assert chats[0] == chats[1] == "(offline assistant) You asked: How do I deploy?"
+    assert fresh_cache.metrics["memory_hits"] == 2
+
+
+def test_timed_out_provider_falls_back_to_the_next():
+    slow, fake = SlowProvider(), FakeProvider()
+    service = make_service(slow, fake)
+
+    refined = asyncio.run(service.refine_analysis(dict(FINDINGS)))
+    assert refined["ai_provider"] == "FakeProvider"
+    assert slow.calls == 1 and fake.calls == 1
+    assert service.breakers["SlowProvider"].stats()["success_rate"] == 0.0
+
+
+def test_failing_provider_falls_back_to_the_next():
+    failing, fake = FailingProvider(), FakeProvider()
+    service = make_service(failing, fake)
+
+    reply = asyncio.run(service.chat_with_agent("hello"))
+    assert reply == "(offline assistant) You asked: hello"
+    assert failing.calls == 1
+
+
+def test_breaker_opens_after_repeated_failures():
+    failing = FailingProvider()
+    service = make_service(failing)
+    min_calls = service._breaker(failing).min_calls
+
+    async def scenario():
+        return [await service.chat_with_agent(f"question {i}") for i in range(min_calls + 2)]
+
+    replies = asyncio.run(scenario())
+    assert service.breakers["FailingProvider"].state == OPEN
+    # Once open, the provider is not called at all
+    assert failing.calls == min_calls
+    assert all("trouble connecting" in reply for reply in replies)
+
+
+def test_failures_are_not_cached():
+    failing = FailingProvider()
+    service = make_service(failing)
+
+    async def scenario():
+        await service.chat_with_agent("hello")
+        await service.chat_with_agent("hello")
+
+    asyncio.run(scenario())
+    assert failing.calls == 2
+
+
+class EmptyBatchProvider(FakeProvider):
+    """Answers batches with no usable entry."""
+
+    async def refine_batch(self, batch):
+        self.calls += 1
+        return [None] * len(batch)
+
+
+def test_batch_without_usable_entries_is_a_failure(fresh_cache):
+    empty, fake = EmptyBatchProvider(), FakeProvider()
+    service = make_service(empty, fake)
+    batch = [dict(FINDINGS, entry_point=f"app{i}.py") for i in range(3)]
+
+    refined = asyncio.run(service.refine_batch(batch))
+    assert all(findings["ai_provider"] == "FakeProvider" for findings in refined)
+    assert service.breakers["EmptyBatchProvider"].stats()["success_rate"] == 0.0
+    # Only the next provider's useful answer was cached
+    assert fresh_cache.metrics["stores"] == 1
@@ -0,0 +1,108 @@
+import asyncio
+import subprocess
+
+import pytest
+
+from app.background import pipeline, stages
+from app.core.config import settings
+from app.services.analysis import analysis_engine
+from app.services.task_manager import task_manager
+
+
+def git(repo, *args) -> str:
+    result = subprocess.run(
+        ["git", "-c", "user.email=dev@example.com", "-c", "user.name=dev", *args],
+        cwd=repo, check=True, capture_output=True, text=True,
+    )
+    return result.stdout.strip()
+
+
+def commit(repo, files, message="change") -> str:
+    for name, content in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+def comparable(findings):
+    summary = analysis_engine.summarize(findings)
+    for key in ("detector_report", "index_stats", "incremental"):
+        summary.pop(key, None)
+    return summary
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "service"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    commit(path, {
+        "requirements.txt": "flask\n",
+        "app.py": "from flask import Flask\napp = Flask(__name__)\n",
+        "README.md": "# Service\n",
+    }, "init")
+    return path
+
+
+def test_manifest_change_updates_the_framework(repo):
+    previous_sha = git(repo, "rev-parse", "HEAD")
+    previous = analysis_engine.analyze_git_objects(str(repo), previous_sha)
+    assert previous["framework"] == "Flask"
+
+    sha = commit(repo, {
+        "requirements.txt": "fastapi\nuvicorn\n",
+        "main.py": "from fastapi import FastAPI\napp = FastAPI()\n",
+    })
+    findings = analysis_engine.analyze_git_diff(str(repo), previous, previous_sha, sha)
+
+    assert findings is not None and findings["incremental"]
+    assert findings["framework"] == "FastAPI"
+    assert comparable(findings) == comparable(analysis_engine.analyze_git_objects(str(repo), sha))
+
+
+def test_irrelevant_change_keeps_the_previous_findings(repo):
+    previous_sha = git(repo, "rev-parse", "HEAD")
+    previous = analysis_engine.analyze_git_objects(str(repo), previous_sha)
+
+    sha = commit(repo, {"README.md": "# Service\n\nNow with docs.\n"})
+    findings = analysis_engine.analyze_git_diff(str(repo), previous, previous_sha, sha)
+
+    assert findings["incremental"] and findings["index_stats"]["changed_files"] == 1
+    assert findings["detector_candidates"] is previous["detector_candidates"]
+    assert comparable(findings) == comparable(previous)
+
+
+def test_unknown_previous_commit_asks_for_a_full_analysis(repo):
+    previous = analysis_engine.analyze_git_objects(str(repo), "HEAD")
+    assert analysis_engine.analyze_git_diff(str(repo), previous, "0" * 40) is None
+
+
+def test_pipeline_falls_back_to_a_full_analysis_when_the_diff_raises(repo, monkeypatch):
+    monkeypatch.setattr(settings, "MIRROR_CACHE_ENABLED", False)
+    full_runs, diffs = [], []
+
+    def analyze(workspace):
+        full_runs.append(workspace)
+        return analysis_engine.analyze_git_objects(workspace)
+
+    def broken_diff(workspace, previous, previous_sha):
+        diffs.append(previous_sha)
+        raise ValueError("corrupt baseline")
+
+    monkeypatch.setattr(stages, "analyze_stage", analyze)
+    monkeypatch.setattr(stages, "incremental_analyze_stage", broken_diff)
+    repo_url = repo.as_uri()
+
+    async def scenario():
+        await pipeline._run_analysis("inc-1", repo_url, "main")
+        commit(repo, {"requirements.txt": "fastapi\nuvicorn\n"})
+        await pipeline._run_analysis("inc-2", repo_url, "main")
+        return await task_manager.get_task("inc-2")
+
+    task = asyncio.run(scenario())
+    assert len(diffs) == 1 and len(full_runs) == 2
+    assert task["status"] == "completed"
+    assert task["findings"]["framework"] == "FastAPI"
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+
+from app import worker as worker_module
+from app.services.job_queue import QUEUED, RUNNING, LocalJobQueue, QueueFullError
+from app.services.task_manager import task_manager
+from app.worker import Worker
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_claims_in_enqueue_order():
+    async def scenario():
+        queue = LocalJobQueue()
+        for job_id in ("a", "b", "c"):
+            await queue.enqueue("analyze", {}, job_id=job_id)
+        claimed = [(await queue.claim("w")).id for _ in range(3)]
+        assert claimed == ["a", "b", "c"]
+        assert await queue.claim("w") is None
+
+    run(scenario())
+
+
+def test_enqueue_rejects_when_full():
+    async def scenario():
+        queue = LocalJobQueue(max_queued=1)
+        assert await queue.enqueue("analyze", {}, job_id="a") == 1
+        assert await queue.is_full()
+        with pytest.raises(QueueFullError):
+            await queue.enqueue("analyze", {}, job_id="b")
+
+    run(scenario())
+
+
+def test_position_reports_waiting_and_running_jobs():
+    async def scenario():
+        queue = LocalJobQueue()
+        await queue.enqueue("analyze", {}, job_id="a")
+        await queue.enqueue("analyze", {}, job_id="b")
+        await queue.claim("w")
+        assert await queue.position("a") == 0
+        assert await queue.position("b") == 1
+        assert await queue.position("missing") is None
+
+    run(scenario())
+
+
+def test_expired_lease_is_reclaimed():
+    async def scenario():
+        queue = LocalJobQueue(lease_seconds=0)
+        await queue.enqueue("analyze", {}, job_id="a")
+        await queue.claim("w1")
+        time.sleep(0.01)
+        second = await queue.claim("w2")
+        assert second.id == "a" and second.worker_id == "w2" and second.attempts == 2
+        # The first worker no longer holds the job
+        assert not await queue.heartbeat("a", "w1")
+        assert not await queue.fail("a", "w1", "late")
+        assert await queue.heartbeat("a", "w2")
+
+    run(scenario())
+
+
+def test_failure_below_max_attempts_is_requeued_after_a_delay():
+    async def scenario():
+        queue = LocalJobQueue(max_attempts=3, retry_delay_seconds=60)
+        await queue.enqueue("analyze", {}, job_id="a")
+        await queue.claim("w")
+        assert await queue.fail("a", "w", "boom")
+        job = queue._jobs["a"]
+        assert job.status == QUEUED and job.error == "boom"
+        assert job.available_at > time.time()
+        assert await queue.claim("w") is None  # Not before the retry delay
+        job.available_at = 0
+        assert (await queue.claim("w")).attempts == 2
+
+    run(scenario())
+
+
+def test_final_failure_is_terminal():
+    async def scenario():
+        queue = LocalJobQueue(max_attempts=2, retry_delay_seconds=0)
+        await queue.enqueue("analyze", {}, job_id="a")
+        await queue.claim("w")
+        assert await queue.fail("a", "w", "boom")
+        await queue.claim("w")
+        assert not await queue.fail("a", "w", "boom again")
+        assert await queue.position("a") is None
+        assert await queue.claim("w") is None
+
+    run(scenario())
+
+
+def test_expired_lease_on_last_attempt_is_reaped():
+    async def scenario():
+        queue = LocalJobQueue(lease_seconds=0, max_attempts=1)
+        await queue.enqueue("analyze", {}, job_id="a")
+        await queue.claim("w")
+        time.sleep(0.01)
+        assert await queue.claim("w") is None
+        assert await queue.reap_expired() == ["a"]
+        assert await queue.position("a") is None
+
+    run(scenario())
+
+
+def test_worker_retries_failed_jobs_then_marks_them_failed(monkeypatch):
+    attempts = []
+
+    async def failing(job_id, **payload):
+        attempts.append(job_id)
+        raise RuntimeError("Cloning failed.")
+
+    monkeypatch.setitem(worker_module.JOB_HANDLERS, "flaky", failing)
+
+    async def scenario():
+        queue = LocalJobQueue(max_attempts=3, retry_delay_seconds=0)
+        await task_manager.update_task("job-1", "queued")
+        await queue.enqueue("flaky", {}, job_id="job-1")
+        worker = Worker(queue, concurrency=1, worker_id="w")
+        worker.start()
+        for _ in range(100):
+            task = await task_manager.get_task("job-1")
+            if task["status"] == "failed":
+                break
+            await asyncio.sleep(0.02)
+        await worker.stop()
+        return task
+
+    task = run(scenario())
+    assert attempts == ["job-1"] * 3
+    assert task["status"] == "failed"
+    assert "Cloning failed." in task["current_message"]
+
+
+def test_worker_cancels_a_job_whose_lease_was_lost(monkeypatch):
+    events = []
+
+    async def slow(job_id, **payload):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+
+    monkeypatch.setitem(worker_module.JOB_HANDLERS, "slow", slow)
+
+    async def scenario():
+        queue = LocalJobQueue(lease_seconds=3)
+        await queue.enqueue("slow", {}, job_id="job-2")
+        worker = Worker(queue, concurrency=1, worker_id="w")
+        worker.start()
+        await asyncio.sleep(0.1)
+        queue._jobs["job-2"].worker_id = "other"  # Another worker reclaimed it
+        await asyncio.sleep(1.2)
+        running = len(worker._running)
+        await worker.stop()
+        return queue._jobs["job-2"].status, running
+
+    status, running = run(scenario())
+    assert events == ["cancelled"]
+    assert status == RUNNING and running == 0
@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime
+
+from loguru import logger
+
+from app.services.log_streamer import LogStreamer
+
+DEBUG, INFO = logger.level("DEBUG").no, logger.level("INFO").no
+
+
+def test_idle_streamer_only_wants_replayable_records():
+    streamer = LogStreamer(replay_lines=10, idle_level="INFO")
+    assert not streamer.wants_record(DEBUG)
+    assert streamer.wants_record(INFO)
+
+    disabled = LogStreamer(replay_lines=0)
+    assert not disabled.wants_record(INFO)
+
+
+def test_subscribed_streamer_wants_every_record():
+    streamer = LogStreamer(replay_lines=0)
+
+    async def scenario():
+        stream = streamer.subscribe()
+        task = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0)
+        wanted = streamer.wants_record(DEBUG)
+        streamer.push_log(datetime.now(), DEBUG, "DEBUG", "cloning")
+        await asyncio.wait_for(task, 1)
+        await stream.aclose()
+        return wanted
+
+    assert asyncio.run(scenario())
+    assert not streamer.wants_record(DEBUG)
@@ -0,0 +1,68 @@
+import os
+import subprocess
+
+import pytest
+
+from app.services import mirror_cache as mirror_cache_module
+from app.services.mirror_cache import MirrorCache, _file_lock
+
+
+def git(*args, cwd=None):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def origin(tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    git("init", "-q", "-b", "main", str(work))
+    (work / "requirements.txt").write_text("fastapi\n")
+    git("add", ".", cwd=work)
+    git("-c", "user.email=dev@example.com", "-c", "user.name=dev", "commit", "-qm", "init", cwd=work)
+    return work.as_uri()
+
+
+@pytest.fixture
+def discarded(monkeypatch):
+    paths = []
+    monkeypatch.setattr(mirror_cache_module.workspace_reaper, "discard", paths.append)
+    return paths
+
+
+def test_acquire_fetches_the_branch(tmp_path, origin):
+    cache = MirrorCache(str(tmp_path / "mirrors"))
+    with cache.acquire(origin, "main") as path:
+        refs = subprocess.run(["git", "-C", path, "for-each-ref", "--format=%(refname)"],
+                              capture_output=True, text=True, check=True).stdout.split()
+    assert refs == ["refs/heads/main"]
+
+
+def test_mirror_is_locked_across_file_descriptors_while_in_use(tmp_path, origin):
+    cache = MirrorCache(str(tmp_path / "mirrors"))
+    lock_path = cache._lock_path(cache.cache_key(origin))
+    with cache.acquire(origin, "main"):
+        with _file_lock(lock_path, blocking=False) as locked:
+            assert not locked
+    with _file_lock(lock_path, blocking=False) as locked:
+        assert locked
+
+
+def test_eviction_runs_when_the_caller_raises(tmp_path, origin, discarded):
+    cache = MirrorCache(str(tmp_path / "mirrors"), max_bytes=0)
+    with pytest.raises(RuntimeError):
+        with cache.acquire(origin, "main") as path:
+            raise RuntimeError("clone failed")
+    assert discarded == [path]
+    assert not cache._sizes
+
+
+def test_mirror_in_use_elsewhere_is_not_evicted(tmp_path, origin, discarded):
+    cache = MirrorCache(str(tmp_path / "mirrors"), max_bytes=10 ** 9)
+    with cache.acquire(origin, "main"):
+        pass
+    cache.max_bytes = 0
+    with _file_lock(cache._lock_path(cache.cache_key(origin))):
+        cache._evict()
+    assert discarded == []
+    cache._evict()
+    assert len(discarded) == 1 and os.path.basename(discarded[0]).endswith(".git")
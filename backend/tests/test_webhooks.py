@@ -0,0 +1,132 @@
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+import os
+
+import pytest
+
+from app.services.repository import GENERATED_COMMIT_MESSAGE
+from app.services.webhooks import (
+    MAX_PAYLOAD_COMMITS,
+    PushDebouncer,
+    is_relevant_push,
+    parse_push_event,
+    verify_signature,
+)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "github_push.json")
+SECRET = "s3cret"
+
+
+@pytest.fixture
+def body() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def payload(body):
+    return json.loads(body)
+
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_verify_signature_accepts_matching_hmac(body):
+    assert verify_signature(SECRET, body, sign(body))
+
+
+@pytest.mark.parametrize("signature", [
+    None,
+    "",
+    sign(b"{}"),
+    sign(b"", secret="other"),
+    "sha1=" + hmac.new(SECRET.encode(), b"", hashlib.sha1).hexdigest(),
+])
+def test_verify_signature_rejects_bad_signatures(body, signature):
+    assert not verify_signature(SECRET, body, signature)
+
+
+def test_verify_signature_rejects_tampered_body(body):
+    assert not verify_signature(SECRET, body + b" ", sign(body))
+
+
+def test_verify_signature_requires_a_secret(body):
+    assert not verify_signature("", body, sign(body, secret=""))
+
+
+def test_parse_push_event(payload):
+    push = parse_push_event(payload)
+    assert push.repo_url == "https://github.com/octo-org/sample-service.git"
+    assert push.branch == "main"
+    assert push.after == "0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c"
+    assert push.changed_paths == ["README.md", "requirements.txt", "src/health.py"]
+    assert push.complete and not push.created and not push.forced and not push.generated
+
+
+def test_parse_push_event_falls_back_to_html_url(payload):
+    del payload["repository"]["clone_url"]
+    assert parse_push_event(payload).repo_url == "https://github.com/octo-org/sample-service"
+
+
+@pytest.mark.parametrize("change", [
+    {"ref": "refs/tags/v1.0.0"},
+    {"deleted": True},
+    {"repository": {}},
+])
+def test_parse_push_event_ignores_non_branch_updates(payload, change):
+    payload.update(change)
+    assert parse_push_event(payload) is None
+
+
+def test_parse_push_event_flags_truncated_payloads(payload):
+    payload["commits"] = [copy.deepcopy(payload["commits"][0]) for _ in range(MAX_PAYLOAD_COMMITS)]
+    assert not parse_push_event(payload).complete
+
+
+def test_parse_push_event_flags_generated_pushes(payload):
+    for commit in payload["commits"]:
+        commit["message"] = GENERATED_COMMIT_MESSAGE
+    assert parse_push_event(payload).generated
+
+
+def test_is_relevant_push(payload):
+    assert is_relevant_push(parse_push_event(payload))
+
+
+def test_is_relevant_push_skips_docs_only_changes(payload):
+    payload["commits"] = payload["commits"][:1]
+    assert not is_relevant_push(parse_push_event(payload))
+
+
+@pytest.mark.parametrize("change", [{"created": True}, {"forced": True}])
+def test_is_relevant_push_assumes_new_and_forced_branches_changed(payload, change):
+    payload["commits"] = payload["commits"][:1]
+    payload.update(change)
+    assert is_relevant_push(parse_push_event(payload))
+
+
+def test_is_relevant_push_skips_generated_pushes(payload):
+    for commit in payload["commits"]:
+        commit["message"] = GENERATED_COMMIT_MESSAGE
+    assert not is_relevant_push(parse_push_event(payload))
+
+
+def test_debouncer_retries_a_busy_branch_a_bounded_number_of_times(payload):
+    calls = []
+
+    async def busy(push):
+        calls.append(push.after)
+        return False
+
+    async def run():
+        debouncer = PushDebouncer(busy, delay=0.01, max_delay=0.1, max_retries=3)
+        debouncer.schedule(parse_push_event(payload))
+        await asyncio.sleep(0.3)
+        assert not debouncer._pending
+
+    asyncio.run(run())
+    assert len(calls) == 4